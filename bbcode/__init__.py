@@ -10,12 +10,42 @@ parsed, errors = bbcode.parse(content, strict=True)
 This might raise a bbocde.PaserError if strict is True (default). Otherwise on a
 ParserError the content is returned unparsed and errors contains the reason.
 
+Streaming:
+
+errors = bbcode.render_to(sink, content)
+
+Writes the parsed content to a file-like object in fragments, use
+bbcode.iter_render(content) to get the fragments as an iterator instead.
+
+Async:
+
+parsed, errors = await bbcode.aparse(content)
+
+On python 3.5+ the tags' data is looked up concurrently and the content is
+rendered in an executor, see bbcode.aio.
+
 Validation:
 
 errors = bbcode.validate(content)
 
 Returns errors caused by parsing the code or an empty sequence.
 
+Profiling:
+
+with bbcode.profiler.profile() as stats:
+    parsed, errors = bbcode.parse(content)
+
+Records the time spent in each phase and tag class, see bbcode.profiler.
+
+Budgets:
+
+parsed, errors = bbcode.parse(content, budget={'TAGS': 1000, 'MS': 200})
+
+Limits the bytes (utf-8), tags, nesting depth and milliseconds spent on a content
+(default: the BBCODE_PARSE_BUDGET setting). A content exceeding its budget is
+returned escaped, or truncated if the time runs out while rendering, and the
+errors contain a SoftException with a 'budget' code.
+
 Extending:
 
 Subclassing bbcode.TagNode and bbcode.register the class adds new BB Code Tags.
@@ -24,16 +54,27 @@ and push, pushed, pull and close methods. For further information read the doc
 strings of the TagNode class.
 """
 import re
-import cgi
+import sys
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+from bisect import bisect_left
+from bbcode.cache import get_render_cache, get_resolver_cache
+from bbcode.compat import PY3, escape, force_bytes, string_types, text_type
+from bbcode.profiler import get_active_profile, timer
 
 try:
-    from django.utils.translation import ugettext as _
+    if PY3:
+        from django.utils.translation import gettext as _
+    else:
+        from django.utils.translation import ugettext as _
 except ImportError:
     _ = lambda x: x
 
 AUTODISCOVERED = False
 
-LINEFEED_PATTERN = re.compile('\n\s*\n', re.MULTILINE)
+LINEFEED_PATTERN = re.compile(r'\n\s*\n', re.MULTILINE)
 def convert_linefeeds(content, as_text=False):
     if as_text:
         converted = LINEFEED_PATTERN.sub(' ', content).replace('\n', ' ')
@@ -41,6 +82,36 @@ def convert_linefeeds(content, as_text=False):
         converted = LINEFEED_PATTERN.sub('<br /><br />', content).replace('\n', '<br /><br />')
     return converted
 
+# whitespace as LINEFEED_PATTERN sees it, unicode whitespace on python 3
+LINEFEED_WHITESPACE = re.compile(r'\s')
+LINEFEED_TRAILING = re.compile(r'\s*\Z')
+def iter_convert_linefeeds(fragments, as_text=False):
+    """
+    Streaming variant of convert_linefeeds, the output is the same as when
+    converting the joined fragments. A trailing whitespace run is held back
+    from its first linefeed on, as it might continue in the next fragment.
+    """
+    pending = ''
+    for fragment in fragments:
+        if not fragment:
+            continue
+        if pending and not LINEFEED_WHITESPACE.match(fragment):
+            yield convert_linefeeds(pending, as_text)
+            pending = ''
+        if pending:
+            fragment = pending + fragment
+        # rstrip() strips at least what \s matches, the run starts at or after
+        trailing = LINEFEED_TRAILING.search(fragment, len(fragment.rstrip())).start()
+        cut = fragment.find('\n', trailing)
+        if cut == -1:
+            pending = ''
+        else:
+            fragment, pending = fragment[:cut], fragment[cut:]
+        if fragment:
+            yield convert_linefeeds(fragment, as_text)
+    if pending:
+        yield convert_linefeeds(pending, as_text)
+
 
 class UnmatchablePseudoPattern(object):
     """
@@ -76,14 +147,55 @@ def get_tag_name(klass):
     """
     return klass.tagname if hasattr(klass, 'tagname') else klass.__name__.lower()
 
+def get_class_path(klass):
+    """
+    Get the dotted import path of a class
+    """
+    return '%s.%s' % (klass.__module__, klass.__name__)
+
 class NeedsSubclassingError(Exception): pass
 class ParserError(Exception): pass
+class BudgetExceeded(ParserError): pass
+class OutOfTime(BudgetExceeded): pass
+
+
+class LineIndex(object):
+    """
+    Maps offsets of a content to line and column numbers. The newline offsets
+    are collected once on first lookup, lookups are binary searches.
+    """
+    def __init__(self, content):
+        self.content = content
+        self.newlines = None
+        
+    def get_newlines(self):
+        if self.newlines is None:
+            self.newlines = [match.start() for match in re.finditer('\n', self.content)]
+        return self.newlines
+        
+    def lineno(self, offset):
+        """
+        Line number (starting at 1) of an offset.
+        """
+        return bisect_left(self.get_newlines(), offset) + 1
+        
+    def column(self, offset):
+        """
+        Column (starting at 1) of an offset.
+        """
+        newlines = self.get_newlines()
+        index = bisect_left(newlines, offset)
+        if not index:
+            return offset + 1
+        return offset - newlines[index - 1]
 
 
 class SoftException(object):
-    def __init__(self, lineno, message):
+    def __init__(self, lineno, message, column=None, code=None):
         self.lineno = lineno
         self.message = message
+        self.column = column
+        self.code = code
         
     def __str__(self):
         return '<span class="bbcode-error lineno">Line %s:</span> <span class="bbcode-error message">%s</span>' % (self.lineno, self.message)
@@ -99,20 +211,48 @@ class SoftExceptionManager(object):
     def __init__(self):
         self.exceptions = []
         self.line_number = 1
+        self.line_index = None
+        self.offset = None
         
     def set_line_number(self, number):
         """
         Update the line number
         """
         self.line_number = number
+        self.offset = None
+        
+    def set_line_index(self, line_index):
+        """
+        Use a LineIndex to resolve offsets given to set_offset.
+        """
+        if self.offset is not None:
+            self.line_number = self.line_index.lineno(self.offset)
+            self.offset = None
+        self.line_index = line_index
+        
+    def set_offset(self, offset):
+        """
+        Update the position. The line number is only looked up when an
+        exception is raised.
+        """
+        self.offset = offset
         
-    def soft_raise(self, exception):
+    def get_position(self):
+        """
+        Returns the current (line number, column), column may be None.
+        """
+        if self.offset is None:
+            return self.line_number, None
+        return self.line_index.lineno(self.offset), self.line_index.column(self.offset)
+        
+    def soft_raise(self, exception, code=None):
         """
         Soft raise an exception. Stores the line number the exception occured
         and the exception message. If deployed in django it will make the 
-        message i18n ready.
+        message i18n ready. 'code' identifies the kind of exception.
         """
-        self.exceptions.append(SoftException(self.line_number, _(exception)))
+        lineno, column = self.get_position()
+        self.exceptions.append(SoftException(lineno, _(exception), column, code))
         
     def pull(self):
         """
@@ -123,35 +263,313 @@ class SoftExceptionManager(object):
         self.exceptions = []
         return old
 
+# Soft exceptions raised outside of a parse end up here
 sem = SoftExceptionManager()
-soft_raise = sem.soft_raise
+
+ACTIVE = threading.local()
+
+def get_active_parse_context():
+    """
+    Get the ParseContext of the parse running in this thread, or the module
+    level SoftExceptionManager if there is none.
+    """
+    return getattr(ACTIVE, 'parse_context', None) or sem
+
+def soft_raise(exception):
+    """
+    Soft raise an exception in the active parse context. Nodes should use
+    their own soft_raise method instead.
+    """
+    get_active_parse_context().soft_raise(exception)
+
+class Lazy(object):
+    """
+    A value resolved by 'resolver' the first time it is used. Special methods
+    are not looked up through __getattr__, the ones used on tag arguments are
+    forwarded explicitly.
+    """
+    def __init__(self, resolver, context):
+        self.resolver = resolver
+        self.context = context
+        self.resolved = False
+        
+    def resolve(self):
+        if not self.resolved:
+            self.context = self.resolver(self.context)
+            self.resolved = True
+        return self.context
+        
+    def __int__(self):
+        return int(self.resolve())
+        
+    def __str__(self):
+        return str(self.resolve())
+        
+    def __unicode__(self):
+        return text_type(self.resolve())
+        
+    def __bool__(self):
+        return bool(self.resolve())
+    __nonzero__ = __bool__
+        
+    def __len__(self):
+        return len(self.resolve())
+        
+    def __iter__(self):
+        return iter(self.resolve())
+        
+    def __contains__(self, item):
+        return item in self.resolve()
+        
+    def __getitem__(self, key):
+        return self.resolve()[key]
+        
+    def __eq__(self, other):
+        return self.resolve() == other
+        
+    def __ne__(self, other):
+        return self.resolve() != other
+        
+    def __hash__(self):
+        return hash(self.resolve())
+        
+    def __add__(self, other):
+        return self.resolve() + other
+        
+    def __radd__(self, other):
+        return other + self.resolve()
+        
+    def __mod__(self, other):
+        return self.resolve() % other
+        
+    def __getattr__(self, attr):
+        return getattr(self.resolve(), attr)
+
 
 class VariableScope(dict):
+    """
+    The $name$ variables of a parse. All variables of a text are replaced in
+    a single pass of one regular expression, compiled when the variables
+    change. Texts without a '$' are left alone.
+    """
+    pattern = None
+    
     def add(self, name, value):
-        dict.__setitem__(self, str(name), str(value))
+        self[str(name)] = str(value)
+        
+    def __setitem__(self, name, value):
+        dict.__setitem__(self, name, value)
+        self.pattern = None
+        
+    def __delitem__(self, name):
+        dict.__delitem__(self, name)
+        self.pattern = None
+        
+    def get_pattern(self):
+        if self.pattern is None:
+            names = sorted(self, key=len, reverse=True)
+            self.pattern = re.compile(r'\$(%s)\$' % '|'.join(re.escape(name) for name in names))
+        return self.pattern
         
     def resolve(self, context):
         context = context.strip('"')
-        for var, value in dict.iteritems(self):
-            context = context.replace('$%s$' % var, value)
-        return context
+        if not self or '$' not in context:
+            return context
+        return self.get_pattern().sub(lambda match: dict.__getitem__(self, match.group(1)), context)
     
     def lazy_resolve(self, context):
-        class Lazy:
-            def __init__(self, resolver, context):
-                self.resolver = resolver
-                self.context = context
-                
-            def __int__(self):
-                self.context = self.resolver(self.context)
-                return int(self.context)
-                
-            def __getattr__(self, attr):
-                self.context = self.resolver(self.context)
-                return self.context.__getattribute__(attr)
+        """
+        Resolve a tag argument when it is first used, variables can still be
+        added while the tree is rendered. Arguments without a '$' are
+        returned resolved.
+        """
+        if '$' not in context:
+            return context.strip('"')
         return Lazy(self.resolve, context)
 
 
+class Prefetcher(object):
+    """
+    Collects the keys tags need resolved while parse trees are built and
+    resolves them in bulk, one call per resolver, when the first value is
+    needed. Sharing a prefetcher between several parse trees resolves the
+    keys of all of them at once.
+    """
+    def __init__(self):
+        self.pending = {}
+        self.resolved = {}
+        
+    def add(self, name, key):
+        if key not in self.resolved.get(name, ()):
+            self.pending.setdefault(name, set()).add(key)
+        
+    def get(self, name, key, default=None):
+        if key not in self.resolved.get(name, ()):
+            self.add(name, key)
+        if name in self.pending:
+            self.resolve(name)
+        value = self.resolved[name].get(key)
+        return default if value is None else value
+        
+    def resolve(self, name):
+        keys, missing = self.take(name)
+        values = {}
+        if missing:
+            values = lib.get_resolver(name)(missing)
+        self.store(name, keys, values)
+        
+    def take(self, name):
+        """
+        Take the pending keys of a resolver, returns them and the list of keys
+        the resolver cache does not know.
+        """
+        keys = self.pending.pop(name)
+        resolved = self.resolved.setdefault(name, {})
+        cache = get_resolver_cache()
+        if not cache:
+            return keys, list(keys)
+        missing = []
+        for key in keys:
+            value = cache.get(cache.get_key(name, key))
+            if value is None:
+                missing.append(key)
+            else:
+                resolved[key] = value
+        return keys, missing
+        
+    def store(self, name, keys, values):
+        """
+        Store the values a resolver returned for the keys taken.
+        """
+        values = values or {}
+        resolved = self.resolved.setdefault(name, {})
+        resolved.update(values)
+        cache = get_resolver_cache()
+        if cache:
+            for key, value in values.items():
+                if value is not None:
+                    cache.set(cache.get_key(name, key), value)
+        for key in keys:
+            resolved.setdefault(key, None)
+
+
+class Budget(object):
+    """
+    The limits of a parse: bytes of the utf-8 encoded content, tags, nesting
+    depth of the tags and milliseconds spent building and rendering the tree.
+    None means unlimited.
+    """
+    def __init__(self, bytes=None, tags=None, depth=None, ms=None):
+        self.bytes = bytes
+        self.tags = tags
+        self.depth = depth
+        self.ms = ms
+        
+    def __bool__(self):
+        return any(limit is not None for limit in (self.bytes, self.tags, self.depth, self.ms))
+    __nonzero__ = __bool__
+        
+
+class ParseContext(SoftExceptionManager):
+    """
+    Holds the state of a single parse: the soft exceptions, the position in the
+    content, the variable scope, the django context and the budget. It is
+    shared by all nodes of a parse tree, so several contents can be parsed
+    concurrently.
+    """
+    def __init__(self, content='', context=None, prefetcher=None, budget=None):
+        SoftExceptionManager.__init__(self)
+        # the source buffer the spans of the nodes point into
+        self.content = content
+        self.line_index = LineIndex(content)
+        self.variables = VariableScope()
+        self.context = context
+        self.prefetcher = prefetcher or Prefetcher()
+        self.profile = get_active_profile()
+        self.budget = get_budget(budget)
+        self.deadline = None
+        if self.budget and self.budget.ms is not None:
+            self.deadline = time.time() + self.budget.ms / 1000.0
+        
+    def out_of_time(self):
+        return self.deadline is not None and time.time() > self.deadline
+        
+    def check_deadline(self):
+        """
+        Raise OutOfTime when the time budget is spent. Nodes call it between
+        their children, so a render stops in nested tags as well.
+        """
+        if self.deadline is not None and time.time() > self.deadline:
+            raise OutOfTime("Parse budget exceeded: ms.")
+        
+    def truncate(self, node):
+        """
+        Soft raise that the render ran out of time and stopped before 'node'.
+        """
+        self.set_offset(getattr(node, 'start', None))
+        self.soft_raise("The content took too long to render and was truncated.", 'budget')
+        
+    def exceed_budget(self, name, message):
+        """
+        Soft raise that a budget is exceeded and stop the parse.
+        """
+        self.soft_raise(message, 'budget')
+        raise BudgetExceeded("Parse budget exceeded: %s." % name)
+        
+    @contextmanager
+    def activated(self):
+        """
+        Route the module level soft_raise to this context in this thread.
+        """
+        previous = getattr(ACTIVE, 'parse_context', None)
+        ACTIVE.parse_context = self
+        try:
+            yield self
+        finally:
+            ACTIVE.parse_context = previous
+
+
+class TagMatch(object):
+    """
+    The spans of the groups of a tag's regular expression match. Nodes keep
+    this instead of the match object, it has the same start, end, span, group,
+    groups and groupdict methods and slices the groups out of the content
+    when asked for them.
+    """
+    __slots__ = ('string', 'spans', 'groupindex')
+
+    def __init__(self, match):
+        self.string = match.string
+        self.spans = tuple(match.span(index) for index in range(match.re.groups + 1))
+        self.groupindex = match.re.groupindex
+
+    def get(self, group, default=None):
+        start, end = self.spans[self.groupindex.get(group, group)]
+        if start == -1:
+            return default
+        return self.string[start:end]
+
+    def start(self, group=0):
+        return self.spans[self.groupindex.get(group, group)][0]
+
+    def end(self, group=0):
+        return self.spans[self.groupindex.get(group, group)][1]
+
+    def span(self, group=0):
+        return self.spans[self.groupindex.get(group, group)]
+
+    def group(self, *groups):
+        if len(groups) < 2:
+            return self.get(groups[0] if groups else 0)
+        return tuple(self.get(group) for group in groups)
+
+    def groups(self, default=None):
+        return tuple(self.get(index, default) for index in range(1, len(self.spans)))
+
+    def groupdict(self, default=None):
+        return dict((name, self.get(index, default)) for name, index in self.groupindex.items())
+
+
 class Node(object):
     """
     This is the baseclass for all objects in a BBCode Parse Tree.
@@ -165,40 +583,82 @@ class Node(object):
     When the Parse Tree is generated the nodes get 'pushed', 'appended', 'pulled'
     and 'closed'. Only TextNodes can be appended to a node's nodelist. When a
     new child node is found it is 'pushed' and becomes the current node. When a
-    node cannot be closed correctly it is 'pulled', which means it's unparsed
-    contents are added to it's parent. Usually this causes a ParserError, which
-    means the Tree is not parseable. When a node is finished parsing it's
+    node cannot be closed correctly it is 'pulled', which means it is replaced
+    by its unparsed contents as text of it's parent. Adjacent text is merged
+    into one TextNode. Pulling the head node causes a ParserError, which means
+    the Tree is not parseable. When a node is finished parsing it's
     'closed' which normally returns the parent.
+
+    Nodes only store the span of their source in the content of the parse
+    (parse_context.content), their content is sliced out of it when needed.
+    The nodes shipped with bbcode define __slots__, subclasses which do not
+    simply get an instance dictionary.
     """
+    __slots__ = ('start', 'end', 'parent', 'match', 'nodes', 'parse_context')
+
     name = 'node'
     
     is_text_node = False
     
+    # Whether documents using this node may be stored in the render cache,
+    # nodes whose output depends on the django context or on data looked up
+    # while rendering must set it to False
+    cacheable = True
+    
+    # Name of the resolver looking up the data of get_resolver_key in bulk
+    resolver = None
+    
     def __init__(self, parent, match, fullcontent, context=None):
         """
         Normal nodes take their parent node as first argument, the regular
-        expression match as second argument and the full context as third
-        argument.
+        expression match as second argument and the full content as third
+        argument. The content and the django context are those of the parse.
         """
         self.start = match.start()
-        self.fullcontent = fullcontent
-        self.raw_content = ''
+        # set when the node is closed
+        self.end = None
         self.parent = parent
-        self.match = match
+        self.match = TagMatch(match)
         self.nodes = []
-        self.context = context # for django only
-        # copy the variable scope
-        self.variables = parent.variables
-        
+        # share the state of the parse
+        self.parse_context = parent.parse_context
+
+    @property
+    def fullcontent(self):
+        return self.parse_context.content
+
+    @property
+    def raw_content(self):
+        """
+        The source of the node, empty until it is closed.
+        """
+        if self.end is None:
+            return ''
+        return self.parse_context.content[self.start:self.end]
+
+    @property
+    def context(self):
+        # for django only
+        return self.parse_context.context
+
+    @property
+    def variables(self):
+        return self.parse_context.variables
+
     def soft_raise(self, errmsg):
-        soft_raise(errmsg)
+        self.parse_context.soft_raise(errmsg)
         return self.raw_content
     
-    def append(self, text):
+    def append(self, start, end):
         """
-        Adds a text node to the node
+        Adds the text of the content between start and end to the node, as a
+        new text node or by extending the last one if they are adjacent.
         """
-        self.nodes.append(TextNode(self, text))
+        nodes = self.nodes
+        if nodes and nodes[-1].is_text_node and nodes[-1].end == start:
+            nodes[-1].end = end
+        else:
+            nodes.append(TextNode(self, start, end))
     
     def push(self, nodeklass, match, fullcontent):
         """
@@ -206,8 +666,26 @@ class Node(object):
         """
         node = nodeklass(self, match, fullcontent, self.context)
         self.nodes.append(node)
+        if node.resolver:
+            key = node.get_resolver_key()
+            if key is not None:
+                self.parse_context.prefetcher.add(node.resolver, key)
         return node.pushed()
     
+    def get_resolver_key(self):
+        """
+        Nodes with a resolver return the key of the data they need here.
+        """
+        return None
+    
+    def get_resolved(self, key=None, default=None):
+        """
+        Get the data of a key (by default the node's key) from the resolver.
+        """
+        if key is None:
+            key = self.get_resolver_key()
+        return self.parse_context.prefetcher.get(self.resolver, key, default)
+    
     def pushed(self):
         """
         Normal Nodes return themselves when being pushed. Self closing nodes
@@ -217,17 +695,20 @@ class Node(object):
     
     def pull(self, end):
         """
-        Pulls all text nodes and returns the parent
+        Replaces the node by its source up to 'end' as text of the parent and
+        returns the parent
         """
-        self.parent.nodes.append(TextNode(self.fullcontent[self.start:end]))
-        return self.parent
-    
+        parent = self.parent
+        # the node being pulled is always the last one of its parent
+        parent.nodes.pop()
+        parent.append(self.start, end)
+        return parent
+
     def close(self, end):
         """
         When closing the node just return the parent.
         """
         self.end = end
-        self.raw_content = self.fullcontent[self.start:end]
         return self.parent
     
     def parse(self, as_text=False):
@@ -236,6 +717,23 @@ class Node(object):
         return a string and fail silently.
         """
         raise NeedsSubclassingError
+    
+    def iter_parse(self, as_text=False):
+        """
+        Yields the parsed node in fragments. Nodes producing large outputs can
+        overwrite this method to stream them.
+        """
+        yield self.parse(as_text=as_text)
+        
+    def check(self):
+        """
+        Soft raises the problems parse would, without rendering the node or
+        looking up data. By default checks the child nodes, tags which do not
+        parse their children or check their arguments overwrite this method.
+        """
+        for node in self.nodes:
+            self.parse_context.check_deadline()
+            node.check()
         
 
 class HeadNode(Node):
@@ -243,11 +741,18 @@ class HeadNode(Node):
     The head node of the BBCode parse tree.
     """
     name = 'head'
-    def __init__(self, raw_content, context=None):
-        self.raw_content = raw_content
+    def __init__(self, raw_content, context=None, parse_context=None):
+        if parse_context is None:
+            parse_context = ParseContext(raw_content, context)
+        parse_context.content = raw_content
+        self.start = 0
+        self.end = len(raw_content)
+        self.parent = None
+        self.match = None
         self.nodes = []
-        self.context = context
-        self.variables = VariableScope()
+        self.parse_context = parse_context
+        self.line_index = parse_context.line_index
+        self.cacheable = True
     
     def pull(self, end):
         raise ParserError("Cannot pull from headnode, invalid BBCode Tree")
@@ -256,23 +761,59 @@ class HeadNode(Node):
         raise ParserError("Cannot close headnode, invalid BBCode Tree")
     
     def parse(self, as_text=False):
-        content = ''
-        failed  = []
+        return ''.join(self.iter_parse(as_text=as_text))
+    
+    def iter_parse(self, as_text=False):
         for node in self.nodes:
-            content += node.parse(as_text=as_text)
-        return content
+            # truncate the render when the time budget is spent, before the
+            # top level node it runs out in
+            try:
+                self.parse_context.check_deadline()
+                profile = self.parse_context.profile
+                with self.parse_context.activated():
+                    if profile is None:
+                        fragments = list(node.iter_parse(as_text=as_text))
+                    else:
+                        fragments = [profile.render_node(node, lambda as_text: ''.join(fragment or '' for fragment in node.iter_parse(as_text=as_text)), as_text)]
+            except OutOfTime:
+                self.parse_context.truncate(node)
+                self.cacheable = False
+                return
+            for fragment in fragments:
+                yield fragment
+    
+    def check(self):
+        for node in self.nodes:
+            try:
+                self.parse_context.check_deadline()
+                with self.parse_context.activated():
+                    node.check()
+            except OutOfTime:
+                self.parse_context.set_offset(getattr(node, 'start', None))
+                self.parse_context.soft_raise("The content took too long to validate.", 'budget')
+                return
     
     
 class TextNode(Node):
+    __slots__ = ()
+
     is_text_node = True
-    def __init__(self, parent, text):
-        self.text = text
-        self.variables = parent.variables
+
+    nodes = ()
+
+    def __init__(self, parent, start, end):
         self.parent = parent
-        self.raw_content = text
-        self.nodes = []
-        
-    def append(self, text):
+        self.start = start
+        self.end = end
+        self.parse_context = parent.parse_context
+
+    @property
+    def text(self):
+        return self.parse_context.content[self.start:self.end]
+
+    raw_content = text
+
+    def append(self, start, end):
         raise TypeError("TextNode does not support appending")
     
     def push(self, node):
@@ -291,13 +832,15 @@ class TextNode(Node):
         """
         Return cgi-escaped content
         """
-        return cgi.escape(self.variables.resolve(self.text))
+        return escape(self.variables.resolve(self.text))
     
     def __str__(self):
         return 'TextNode: %r' % self.text
         
     
 class TagNode(Node):
+    __slots__ = ()
+
     @staticmethod
     def open_pattern():
         raise NeedsSubclassingError
@@ -309,16 +852,31 @@ class TagNode(Node):
         """
         Shortcut for parsing all inner nodes and return their combined contents.
         """
-        inner = ''
+        parse_context = self.parse_context
+        profile = parse_context.profile
+        nodes = self.nodes
+        if parse_context.deadline is not None:
+            nodes = self.iter_nodes_in_time()
+        if profile is not None:
+            return ''.join(profile.render_node(node, node.parse, as_text) for node in nodes)
+        return ''.join(node.parse(as_text) for node in nodes)
+    
+    def iter_nodes_in_time(self):
+        """
+        Iterate over the child nodes, raise OutOfTime when the time budget is
+        spent.
+        """
         for node in self.nodes:
-            inner += node.parse(as_text)
-        return inner
+            self.parse_context.check_deadline()
+            yield node
     
     def __str__(self):
         return self.__class__.__name__
 
 
 class BlockTagNode(TagNode):
+    __slots__ = ()
+
     def __str__(self):
         'BlockTagNode: %s' % super(BlockTagNode, self).__str__()
 
@@ -332,17 +890,19 @@ class ReplaceTagNode(TagNode):
     Requires an explicit 'tagname' attribute, otherwise the lowered class name
     will be used as tagname
     """
+    # not 'tagname', a slot would give every subclass a tagname attribute
+    __slots__ = ('html_tagname',)
+
     def __init__(self, parent, match, content, context):
         """
         Implicitly set tag name if not available.
         """
-        if not hasattr(self, 'tagname'):
-            self.tagname = self.__class__.__name__.lower()
+        self.html_tagname = get_tag_name(self.__class__)
         TagNode.__init__(self, parent, match, content, context)
         
     def parse(self, as_text=False):
         if as_text: return self.parse_inner(as_text)
-        return '<%s>%s</%s>' % (self.tagname, self.parse_inner(as_text), self.tagname)
+        return '<%s>%s</%s>' % (self.html_tagname, self.parse_inner(as_text), self.html_tagname)
     
     def __str__(self):
         return 'ReplaceTagNode: %s' % self.__class__.__name__
@@ -353,6 +913,8 @@ class BlockReplaceTagNode(ReplaceTagNode):
     Variant of ReplaceTagNode
     For block elements that don't fit in a paragraph
     """
+    __slots__ = ()
+
     def parse(self, as_text=False):
         if as_text: return super(BlockReplaceTagNode, self).parse(as_text)
         return '<p>%s</p>' % super(BlockReplaceTagNode, self).parse(as_text)
@@ -366,6 +928,8 @@ class ArgumentTagNode(TagNode):
     TagNode which takes one (or no) argument. Open pattern must have a named
     group 'argument'.
     """
+    __slots__ = ('argument',)
+
     def __init__(self, parent, match, content, context):
         TagNode.__init__(self, parent, match, content, context)
         arg = match.group('argument')
@@ -376,6 +940,8 @@ class ArgumentTagNode(TagNode):
 
 
 class BlockArgumentTagNode(ArgumentTagNode):
+    __slots__ = ()
+
     def __str__(self):
         'BlockArgumentTagNode: %s' % super(BlockArgumentTagNode, self).__str__()
 
@@ -395,6 +961,8 @@ class MultiArgumentTagNode(TagNode):
     Open pattern should use bbcode.patterns.argument as argument matching
     expression.
     """
+    __slots__ = ('arguments',)
+
     _arguments   = []
     def __init__(self, parent, match, content, context):
         TagNode.__init__(self, parent, match, content, context)
@@ -409,12 +977,14 @@ class MultiArgumentTagNode(TagNode):
         
     def __str__(self):
         args = []
-        for key, value in self.arguments.iteritems():
+        for key, value in self.arguments.items():
             args.append('%s: %s' % (key, value))
         return '%s (%s)' % (self.__class__.__name__, ', '.join(args))
 
 
 class BlockMultiArgumentTagNode(MultiArgumentTagNode):
+    __slots__ = ()
+
     def __str__(self):
         'BlockMultiArgumentTagNode: %s' % super(BlockMultiArgumentTagNode, self).__str__()
 
@@ -423,17 +993,17 @@ class SelfClosingTagNode(TagNode):
     """
     A tag which is self closed.
     """
+    __slots__ = ()
+
     close_pattern = patterns.unmatchable
-    
+
+    nodes = ()
+
     def __init__(self, parent, match, content, context):
-        self.start = match.start()
-        self.context = context
-        self.fullcontent = content
-        self.raw_content = content[match.start():match.end()]
+        self.start, self.end = match.span()
         self.parent = parent
-        self.match = match
-        self.nodes = []
-        self.variables = parent.variables
+        self.match = TagMatch(match)
+        self.parse_context = parent.parse_context
     
     def pushed(self):
         """
@@ -457,6 +1027,204 @@ class AutoDict(dict):
         return dict.__getitem__(self, item)
     
     
+class Tokenizer(object):
+    """
+    Finds the opening and closing tags of a set of tag classes in a single
+    left-to-right pass over the content.
+
+    The open and close patterns are split into their alternatives and merged
+    into one expression, each branch followed by an empty marker group telling
+    which tag matched. Inner groups are made non-capturing, the tag's own
+    pattern is matched again at the found position. As every branch starts
+    with a literal character, the regular expression engine only tries the
+    branches at positions where a tag could start.
+    Patterns which cannot be merged (custom flags, backreferences, no literal
+    first character, pseudo patterns without a 'pattern' source) are searched
+    on their own. Matches starting within an earlier match are never
+    returned, when two tags match at the same position the first one in
+    'patterns' wins.
+    """
+    # re supports at most 100 groups per expression
+    max_branches = 99
+    atom_pattern = re.compile(r'\\.|\[\^?\]?(?:\\.|[^\]])*\]|\(\?P<\w+>|\(\?[:=!]|\(\?<[=!]|.', re.DOTALL)
+    literal_pattern = re.compile(r'\\[^A-Za-z0-9]|[^\\.^$*+?{}\[\]()|]$')
+    unmergeable_pattern = re.compile(r'\(\?P=|\(\?\(|\\\d|\(\?[iLmsux]+\)')
+    default_flags = re.compile('').flags
+
+    def __init__(self, patterns):
+        """
+        Takes a sequence of (tagklass, open_pattern, close_pattern) tuples.
+        """
+        self.scanners = []
+        branches = []
+        dispatch = {}
+        for order, (tagklass, open_pattern, close_pattern) in enumerate(patterns):
+            for opener, pattern in ((True, open_pattern), (False, close_pattern)):
+                if isinstance(pattern, UnmatchablePseudoPattern):
+                    continue
+                entry = (order, tagklass, opener, pattern)
+                sources = self.get_branch_sources(pattern)
+                if sources is None:
+                    self.scanners.append((pattern, entry))
+                    continue
+                for source in sources:
+                    branches.append('%s()' % source)
+                    dispatch[len(branches)] = entry
+                    if len(branches) == self.max_branches:
+                        self.scanners.append((re.compile('|'.join(branches)), dispatch))
+                        branches, dispatch = [], {}
+        if branches:
+            self.scanners.append((re.compile('|'.join(branches)), dispatch))
+        # Scanners are asked in tag order, the first one wins on a tie
+        self.scanners.sort(key=lambda scanner: self.get_order(scanner[1]))
+
+    def get_order(self, dispatch):
+        if isinstance(dispatch, dict):
+            return min(dispatch.values())[0]
+        return dispatch[0]
+
+    def get_branch_sources(self, pattern):
+        """
+        Returns the alternatives of a compiled pattern with all groups made
+        non-capturing, or None if it cannot be merged with other patterns.
+        """
+        source = getattr(pattern, 'pattern', None)
+        if not isinstance(source, string_types) or not source:
+            return None
+        if pattern.flags != self.default_flags:
+            return None
+        if self.unmergeable_pattern.search(source):
+            return None
+        atoms = []
+        for atom in self.atom_pattern.findall(source):
+            if atom == '(' or atom.startswith('(?P<'):
+                atom = '(?:'
+            atoms.append(atom)
+        try:
+            if re.compile(''.join(atoms)).groups:
+                return None
+        except re.error:
+            return None
+        branches = []
+        pending = [atoms]
+        while pending:
+            atoms = pending.pop(0)
+            alternatives = self.split_alternatives(atoms)
+            if len(alternatives) > 1:
+                pending[:0] = alternatives
+                continue
+            if not atoms:
+                return None
+            end = self.get_group_end(atoms)
+            if end is None:
+                following = atoms[1:2]
+            else:
+                following = atoms[end + 1:end + 2]
+            if following and following[0] in ('*', '+', '?', '{'):
+                return None
+            if atoms[0] == '(?:':
+                # (?:a|b)c is the same as ac|bc
+                rest = atoms[end + 1:]
+                pending[:0] = [alternative + rest for alternative
+                               in self.split_alternatives(atoms[1:end])]
+            elif self.literal_pattern.match(atoms[0]):
+                branches.append(''.join(atoms))
+            else:
+                return None
+        return branches
+
+    def split_alternatives(self, atoms):
+        alternatives = [[]]
+        depth = 0
+        for atom in atoms:
+            if atom == '|' and not depth:
+                alternatives.append([])
+                continue
+            if atom.startswith('('):
+                depth += 1
+            elif atom == ')':
+                depth -= 1
+            alternatives[-1].append(atom)
+        return alternatives
+
+    def get_group_end(self, atoms):
+        if not atoms[0].startswith('('):
+            return None
+        depth = 0
+        for index, atom in enumerate(atoms):
+            if atom.startswith('('):
+                depth += 1
+            elif atom == ')':
+                depth -= 1
+                if not depth:
+                    return index
+        return None
+
+    def tokenize(self, content, pos=0):
+        """
+        Yields (match, tagklass, opener) tuples in document order. 'match' is
+        the match object of the tag's own pattern. Tags are looked for from
+        'pos' on.
+        """
+        if len(self.scanners) == 1 and isinstance(self.scanners[0][1], dict):
+            regex, dispatch = self.scanners[0]
+            for found in regex.finditer(content, pos):
+                order, tagklass, opener, pattern = dispatch[found.lastindex]
+                yield pattern.match(content, found.start()), tagklass, opener
+            return
+        pending = [[scanner, None] for scanner in self.scanners]
+        length = len(content)
+        while pos <= length:
+            best = None
+            for candidate in pending:
+                (regex, dispatch), found = candidate
+                if found is False:
+                    continue
+                if found is None or found.start() < pos:
+                    found = candidate[1] = regex.search(content, pos) or False
+                    if found is False:
+                        continue
+                if isinstance(dispatch, dict):
+                    entry = dispatch[found.lastindex]
+                else:
+                    entry = dispatch
+                if best is None or (found.start(), entry[0]) < (best[0], best[1][0]):
+                    best = (found.start(), entry)
+            if best is None:
+                return
+            start, (order, tagklass, opener, pattern) = best
+            match = pattern.match(content, start)
+            yield match, tagklass, opener
+            pos = match.end() if match.end() > start else start + 1
+
+
+class TagProfile(object):
+    """
+    The compiled state of a tag set: the resolved tag classes, their compiled
+    open and close patterns and the tokenizer dispatching matches to them.
+    Profiles are built by Library.get_profile and remember the library
+    version they were built for.
+    """
+    def __init__(self, tags, version):
+        self.version = version
+        self.tags = frozenset(tags)
+        self.open_patterns = {}
+        self.close_patterns = {}
+        patterns = []
+        for tagklass in sorted(self.tags, key=lambda klass: (klass.__module__, klass.__name__)):
+            op = tagklass.open_pattern
+            if callable(op):
+                op = op()
+            cp = tagklass.close_pattern
+            if callable(cp):
+                cp = cp()
+            self.open_patterns[tagklass] = op
+            self.close_patterns[tagklass] = cp
+            patterns.append((tagklass, op, cp))
+        self.tokenizer = Tokenizer(patterns)
+        self.uncacheable = frozenset(klass for klass in self.tags if not klass.cacheable)
+
+
 class Library(object):
     """
     The core of the BBCode parser. Keeps track of all bbcode tags and text
@@ -466,10 +1234,39 @@ class Library(object):
     name_pat2 = re.compile('(.)([A-Z][a-z]+)')
     
     def __init__(self):
-        self.names = AutoDict(None)
-        self.raw_names = {}
-        self.tags = AutoDict(set)
-        self.klasses = AutoDict(None)
+        self._names = AutoDict(None)
+        self._raw_names = {}
+        self._tags = AutoDict(set)
+        self._klasses = AutoDict(None)
+        self.profiles = {}
+        self.version = 0
+        self.fingerprint = None
+        self.deferred = []
+        self.loading = False
+        self.lock = threading.RLock()
+        self.resolvers = {}
+        self.async_resolvers = {}
+    
+    # The registries import the deferred tag modules when first accessed.
+    @property
+    def names(self):
+        self.load()
+        return self._names
+    
+    @property
+    def raw_names(self):
+        self.load()
+        return self._raw_names
+    
+    @property
+    def tags(self):
+        self.load()
+        return self._tags
+    
+    @property
+    def klasses(self):
+        self.load()
+        return self._klasses
     
     def convert(self, name):
         """
@@ -509,10 +1306,7 @@ class Library(object):
             klass.namespaces.insert(0, ns)
         # Register documentation
         docstrings = klass.__doc__
-        if hasattr(klass, 'tagname'):
-            tagname = klass.tagname
-        else:
-            tagname = klass.__name__.lower()
+        tagname = get_tag_name(klass)
         if docstrings:
             if hasattr(klass, 'verbose_name'):
                 verbose_name = klass.verbose_name
@@ -523,15 +1317,121 @@ class Library(object):
                                    'class': klass}
             self.klasses[klass] = self.names[tagname]
         self.raw_names[klass.__name__] = klass
+        self.invalidate()
+        
+    def invalidate(self):
+        """
+        Bump the library version, which drops all compiled profiles. Called
+        whenever the registry changes.
+        """
+        self.version += 1
+        self.profiles = {}
+        self.fingerprint = None
+        
+    def register_resolver(self, name, resolve_many):
+        """
+        Register the function resolving the keys of the tags with that
+        resolver name. It takes a list of keys and returns a dictionary.
+        """
+        self.resolvers[name] = resolve_many
+        
+    def register_async_resolver(self, name, resolve_many):
+        """
+        Register the coroutine function bbcode.aio.aparse awaits instead of
+        the resolver of that name, or its dotted path.
+        """
+        self.async_resolvers[name] = resolve_many
+        
+    def get_resolver_path(self, name):
+        """
+        Get the dotted path of a resolver in the BBCODE_RESOLVERS setting.
+        """
+        try:
+            from django.conf import settings
+            from django.core.exceptions import ImproperlyConfigured
+        except ImportError:
+            return None
+        try:
+            return getattr(settings, 'BBCODE_RESOLVERS', {}).get(name)
+        except ImproperlyConfigured:
+            return None
+        
+    def get_resolver(self, name):
+        """
+        Get a resolver, the BBCODE_RESOLVERS setting (a dictionary of names and
+        dotted paths) overrides the registered ones.
+        """
+        path = self.get_resolver_path(name)
+        if path:
+            from django.utils.module_loading import import_string
+            return import_string(path)
+        if name not in self.resolvers:
+            self.load()
+        return self.resolvers.get(name, lambda keys: {})
+        
+    def get_async_resolver(self, name):
+        """
+        Get the async variant of a resolver, None if there is none or the
+        resolver is overridden by the BBCODE_RESOLVERS setting.
+        """
+        if self.get_resolver_path(name):
+            return None
+        if name not in self.async_resolvers:
+            self.load()
+        resolve_many = self.async_resolvers.get(name)
+        if resolve_many is not None and not callable(resolve_many):
+            from django.utils.module_loading import import_string
+            resolve_many = self.async_resolvers[name] = import_string(resolve_many)
+        return resolve_many
+        
+    def invalidate_resolved(self, name, *keys):
+        """
+        Drop the cached values of a resolver's keys, call this when the data
+        changes (eg invalidate_resolved('quote', content_id)).
+        """
+        cache = get_resolver_cache()
+        if cache:
+            for key in keys:
+                cache.delete(cache.get_key(name, key))
+        
+    def defer(self, module):
+        """
+        Import a module registering tags only when the tags are first needed.
+        """
+        self.deferred.append(module)
+        self.invalidate()
+        
+    def load(self):
+        """
+        Import the deferred tag modules. A module stays deferred until it was
+        imported successfully, so a failed import is retried on the next
+        access instead of its tags going missing.
+        """
+        if not self.deferred:
+            return
+        with self.lock:
+            # the modules register their tags while being imported
+            if self.loading:
+                return
+            self.loading = True
+            try:
+                while self.deferred:
+                    module = self.deferred[0]
+                    __import__(module)
+                    self.deferred.remove(module)
+            finally:
+                self.loading = False
         
     def add_namespace(self, klass, *namespaces):
         """
         Add a tag to a namespace or several namespaces
         """
-        if isinstance(klass, TagNode):
+        self.load()
+        if isinstance(klass, type) and issubclass(klass, TagNode):
             for namespace in namespaces:
                 self.tags[namespace].add(klass)
-        elif isinstance(klass, basestring):
+            self.invalidate()
+        elif isinstance(klass, string_types):
             if klass in self.raw_names:
                 self.add_namespace(self.raw_names[klass], *namespaces)
             elif klass in self.names:
@@ -541,14 +1441,16 @@ class Library(object):
         """
         Remove a tag from a namespace or several namespaces
         """
-        if isinstance(klass, TagNode):
+        self.load()
+        if isinstance(klass, type) and issubclass(klass, TagNode):
             for namespace in namespaces:
                 if klass in self.tags[namespace]:
                     self.tags[namespace].remove(klass)
-        elif isinstance(klass, basestring):
+            self.invalidate()
+        elif isinstance(klass, string_types):
             if klass in self.raw_names:
-                self.add_namespace(self.raw_names[klass], *namespaces)
-            elif klass in remove_namespace.names:
+                self.remove_namespace(self.raw_names[klass], *namespaces)
+            elif klass in self.names:
                 self.remove_namespace(self.names[klass]['class'], *namespaces)
                 
     def set_not_in_all(self, klass, flag=True):
@@ -564,6 +1466,7 @@ class Library(object):
         """
         Get a list of tag classes for the namespaces
         """
+        self.load()
         if namespaces is None:
             namespaces = get_default_namespaces()
         tags = set()
@@ -590,79 +1493,144 @@ class Library(object):
             tags = tags.difference(self.tags[ns])
         return tags
     
-    def get_taglist(self, content, namespaces=None):
+    def get_profile(self, namespaces=None):
         """
-        Get the tag-match list of a content for given namespaces
+        Get the compiled TagProfile for the namespaces. Profiles are cached
+        by namespace set and shared between namespace sets resolving to the
+        same tags until the registry changes.
         """
         if namespaces is None:
             namespaces = get_default_namespaces()
-        tags = self.get_tags(namespaces)
-        # Build tag list
-        taglist = []
-        for tagklass in tags:
-            op = tagklass.open_pattern
-            if callable(op):
-                op = op()
-            i = 1
-            for match in op.finditer(content):
-                i += 1
-                taglist.append((match.start(), match, tagklass, True))
-            cp = tagklass.close_pattern
-            if callable(cp):
-                cp = cp()
-            for match in cp.finditer(content):
-                taglist.append((match.start(), match, tagklass, False))
-        # Sort by position
-        return sorted(taglist)
+        key = frozenset(namespaces)
+        profile = self.profiles.get(key)
+        if profile is None or profile.version != self.version:
+            tags = frozenset(self.get_tags(key))
+            profile = self.profiles.get(tags)
+            if profile is None or profile.version != self.version:
+                profile = self.profiles[tags] = TagProfile(tags, self.version)
+            self.profiles[key] = profile
+        return profile
+    
+    def get_fingerprint(self):
+        """
+        Get a digest of the registered tags and their namespaces. It is the
+        same in every process registering the same tags and changes whenever
+        the registry changes.
+        """
+        if self.fingerprint is None:
+            self.load()
+            digest = hashlib.sha1()
+            for namespace in sorted(self.tags):
+                paths = sorted(get_class_path(klass) for klass in self.tags[namespace])
+                digest.update(force_bytes('%s:%s\n' % (namespace, ','.join(paths))))
+            self.fingerprint = digest.hexdigest()
+        return self.fingerprint
+    
+    def get_taglist(self, content, namespaces=None):
+        """
+        Get the tag-match list of a content for given namespaces. Matches
+        starting within an earlier match are not part of the list.
+        """
+        tokenizer = self.get_profile(namespaces).tokenizer
+        return [(match.start(), match, tagklass, opener)
+                for match, tagklass, opener in tokenizer.tokenize(content)]
     
-    def get_parse_tree(self, content, namespaces=None, context=None):
+    def get_parse_tree(self, content, namespaces=None, context=None, parse_context=None):
         """
-        Prepare content for parsing.
+        Prepare content for parsing. Soft exceptions are stored in the
+        parse_context, pass one to get them when a ParserError is raised.
+        Returns a HeadNode instance
+        """
+        profile = self.get_profile(namespaces)
+        tokens = profile.tokenizer.tokenize(content)
+        stats = parse_context.profile if parse_context else get_active_profile()
+        if stats is not None:
+            # tokenize up front to time it apart from the tree building
+            started = timer()
+            tokens = list(tokens)
+            stats.add_phase('tokenize', started, len(content))
+        return self.build_parse_tree(content, tokens, context, profile.uncacheable,
+                                     parse_context)
+    
+    def build_parse_tree(self, content, tokens, context=None, uncacheable=frozenset(),
+                         parse_context=None):
+        """
+        Build the parse tree of a content from its (match, tagklass, opener)
+        tuples in document order, as yielded by Tokenizer.tokenize.
         Returns a HeadNode instance
         """
-        if namespaces is None:
-            namespaces = get_default_namespaces()
-        taglist = self.get_taglist(content, namespaces)
-        
         # Get headnode
-        headnode = HeadNode(content, context)
-        
+        headnode = HeadNode(content, context, parse_context)
+        profile = headnode.parse_context.profile
+        started = timer() if profile is not None else None
+        with headnode.parse_context.activated():
+            self.fill_parse_tree(headnode, content, tokens, uncacheable)
+        if profile is not None:
+            profile.add_phase('build', started, len(content))
+        return headnode
+    
+    def fill_parse_tree(self, headnode, content, tokens, uncacheable):
+        """
+        Push, append, pull and close the nodes of the tokens on the head node.
+        """
+        parse_context = headnode.parse_context
+        budget = parse_context.budget
+        max_tags = max_depth = None
+        if budget:
+            # utf-8 takes one to four bytes per character
+            if budget.bytes is not None and len(content) * 4 > budget.bytes:
+                size = len(force_bytes(content))
+                if size > budget.bytes:
+                    parse_context.exceed_budget('bytes', "The content is too long (%s bytes, at most %s are allowed)." % (size, budget.bytes))
+            max_tags, max_depth = budget.tags, budget.depth
+        tags = depth = 0
         lastpos = 0
         currentnode = headnode
-        # Loop over tag matches
-        for pos, match, tagklass, opener in taglist:
+        # Loop over tag matches, the tokenizer already skips tags matching
+        # within other tags (eg AutoDetectURL)
+        for match, tagklass, opener in tokens:
             start, end = match.span()
-            # Prevent tags matching within other tags (eg AutoDetectURL)
-            if start < lastpos:
-                continue
+            if budget:
+                tags += 1
+                if max_tags is not None and tags > max_tags:
+                    parse_context.set_offset(start)
+                    parse_context.exceed_budget('tags', "The content has too many tags (at most %s are allowed)." % max_tags)
+                if parse_context.out_of_time():
+                    parse_context.set_offset(start)
+                    parse_context.exceed_budget('ms', "The content took too long to parse (more than %s ms)." % budget.ms)
             # Append text between last tag and this one
-            text = content[lastpos:start]
-            if text:
-                currentnode.append(text)
+            if start > lastpos:
+                currentnode.append(lastpos, start)
             # Set new position
             lastpos = end
-            # Get line number for soft exceptions
-            lineno = content[:start].count('\n') + 1
-            sem.set_line_number(lineno)
+            # Set position for soft exceptions
+            parse_context.set_offset(start)
             # if opener, push new node
             if opener:
-                currentnode = currentnode.push(tagklass, match, content)
+                if tagklass in uncacheable:
+                    headnode.cacheable = False
+                pushed = currentnode.push(tagklass, match, content)
+                # self closing tags return the current node
+                if pushed is not currentnode:
+                    depth += 1
+                    if max_depth is not None and depth > max_depth:
+                        parse_context.exceed_budget('depth', "The tags are nested too deeply (at most %s levels are allowed)." % max_depth)
+                currentnode = pushed
             # else close the tag
             else:
                 # pull all unclosed child tags of the current node
                 while tagklass != currentnode.__class__:
                     try:
-                        currentnode = currentnode.pull(end)
+                        currentnode = currentnode.pull(start)
                     except ParserError:
-                        sem.soft_raise("BBCode could not be parsed. There are probably unclosed or uneven tags!")
-                        raise ParserError("Failed to find matching opening tag for closing tag '%s' in line %s."  % (get_tag_name(tagklass), lineno))
+                        parse_context.soft_raise("BBCode could not be parsed. There are probably unclosed or uneven tags!")
+                        raise ParserError("Failed to find matching opening tag for closing tag '%s' in line %s."  % (get_tag_name(tagklass), headnode.line_index.lineno(start)))
+                    depth -= 1
                 # close the node
                 currentnode = currentnode.close(end)
-        text = content[lastpos:]
-        if text:
-            headnode.append(text)
-        # Return the head node
-        return headnode
+                depth -= 1
+        if len(content) > lastpos:
+            headnode.append(lastpos, len(content))
     
     def get_visual_parse_tree(self, content, namespaces=None, indent=4):
         if namespaces is None:
@@ -684,37 +1652,116 @@ class Library(object):
         visuals += recurse(head.nodes, 1, indent)
         return '\n'.join(visuals)
     
-    def validate(self, content, namespaces=None, auto_discover=False):
+    def validate(self, content, namespaces=None, auto_discover=False, budget=None,
+                 render=False):
         """
         Validates a given content and returns the errors or an empty sequence.
+        The tags are checked (see Node.check) instead of rendered, pass
+        render=True to render the content and collect the errors of tags
+        without a check method.
         """
         if namespaces is None:
             namespaces = get_default_namespaces()
         if auto_discover:
             autodiscover()
+        parse_context = ParseContext(content, budget=budget)
         try:
-            headnode = self.get_parse_tree(content, namespaces)
+            headnode = self.get_parse_tree(content, namespaces, None, parse_context)
         except ParserError:
-            return sem.pull()
-        parsed = headnode.parse()
-        return sem.pull()
+            return parse_context.pull()
+        if render:
+            headnode.parse()
+        else:
+            headnode.check()
+        return parse_context.pull()
 
 
 lib = Library()
 register = lib.register
+register_resolver = lib.register_resolver
+register_async_resolver = lib.register_async_resolver
+invalidate_resolved = lib.invalidate_resolved
 validate = lib.validate
 get_visual = lib.get_visual_parse_tree
 
+DEFAULT_NAMESPACES = None
+
 def get_default_namespaces():
-    from django.conf import settings
-    if hasattr(settings, 'BBCODE_DEFAULT_NAMESPACES'):
-        return settings.BBCODE_DEFAULT_NAMESPACES
-    return ['__all__']
+    """
+    Get the namespaces from the BBCODE_DEFAULT_NAMESPACES setting. The
+    setting is only read once.
+    """
+    global DEFAULT_NAMESPACES
+    if DEFAULT_NAMESPACES is None:
+        from django.conf import settings
+        if hasattr(settings, 'BBCODE_DEFAULT_NAMESPACES'):
+            DEFAULT_NAMESPACES = frozenset(settings.BBCODE_DEFAULT_NAMESPACES)
+        else:
+            DEFAULT_NAMESPACES = frozenset(['__all__'])
+    return DEFAULT_NAMESPACES
+
+def reset_default_namespaces(setting=None, **kwargs):
+    """
+    Forget the default namespaces when the setting is overridden (eg in tests).
+    """
+    global DEFAULT_NAMESPACES
+    if setting == 'BBCODE_DEFAULT_NAMESPACES':
+        DEFAULT_NAMESPACES = None
+
+DEFAULT_BUDGET = None
+
+def get_budget(budget=None):
+    """
+    Get a Budget from a Budget, a dictionary with BYTES, TAGS, DEPTH and MS
+    keys, False (unlimited) or None for the BBCODE_PARSE_BUDGET setting. The
+    setting is only read once.
+    """
+    global DEFAULT_BUDGET
+    if budget is None:
+        if DEFAULT_BUDGET is None:
+            from django.conf import settings
+            DEFAULT_BUDGET = get_budget(getattr(settings, 'BBCODE_PARSE_BUDGET', None) or False)
+        return DEFAULT_BUDGET
+    if isinstance(budget, dict):
+        return Budget(**dict((key.lower(), value) for key, value in budget.items()))
+    return budget or Budget()
+
+def reset_default_budget(setting=None, **kwargs):
+    """
+    Forget the default budget when the setting is overridden.
+    """
+    global DEFAULT_BUDGET
+    if setting == 'BBCODE_PARSE_BUDGET':
+        DEFAULT_BUDGET = None
+
+try:
+    from django.core.signals import setting_changed
+except ImportError:
+    pass
+else:
+    setting_changed.connect(reset_default_namespaces)
+    setting_changed.connect(reset_default_budget)
     
-def parse(content, namespaces=None, strict=True, auto_discover=False,
-          context=None, as_text=False):
+def iter_render(content, namespaces=None, strict=True, auto_discover=False,
+                context=None, as_text=False, cache=None, errors=None,
+                prefetcher=None, budget=None):
     """
-    Parse a content with the BBCodes
+    Parse a content with the BBCodes and return an iterator over the parsed
+    content in fragments.
+    
+    The parse tree is built right away, so a ParserError is raised by this
+    function in strict mode. Errors are appended to the 'errors' list (if
+    given) once the iterator is exhausted, which it always should be.
+    
+    'budget' limits the parse (see get_budget), a content exceeding it is
+    escaped instead of parsed, also in strict mode. Contents parsed with a
+    'budget' argument are not cached, as it may reject a cached content.
+    
+    'cache' is a bbcode.cache.RenderCache, False to bypass caching or None to
+    use the cache configured by the BBCODE_RENDER_CACHE setting.
+    
+    A Prefetcher shared by several calls resolves the data of their tags at
+    once, when the first of them is rendered.
     """
     if auto_discover:
         autodiscover()
@@ -722,29 +1769,180 @@ def parse(content, namespaces=None, strict=True, auto_discover=False,
         namespaces = get_default_namespaces()
     # Fix windows linefeeds
     content = content.replace('\r','')
-    # Get head node
-    if strict:
-        head = lib.get_parse_tree(content, namespaces, context)
+    # Look up the render cache
+    if cache is None:
+        cache = get_render_cache()
+    if budget is not None:
+        cache = False
+    budget = get_budget(budget)
+    key = None
+    if cache:
+        key = cache.get_key(content, namespaces, as_text, lib.get_fingerprint(), budget)
+        cached = cache.get(key)
+        # unparseable contents have to raise in strict mode
+        if cached is not None and not (strict and cached[2]):
+            if errors is not None:
+                errors.extend(cached[1])
+            return iter([cached[0]])
+    # Get head node, None if the content is unparseable
+    parse_context = ParseContext(content, context, prefetcher, budget)
+    try:
+        head = lib.get_parse_tree(content, namespaces, context, parse_context)
+    except BudgetExceeded:
+        # the result depends on the budget, do not cache it
+        return render_fragments(parse_context, None, escape(content), as_text, errors)
+    except ParserError:
+        if strict:
+            raise
+        head = None
+    return render_fragments(parse_context, head, content, as_text, errors, cache, key)
+
+def render_fragments(parse_context, head, content, as_text=False, errors=None,
+                     cache=None, key=None):
+    """
+    Yields the parsed fragments of a parse tree with linefeeds replaced, or the
+    unparsed content if head is None. Stores the result in the cache when done.
+    """
+    if head is None:
+        fragments = [content]
     else:
-        try:
-            head = lib.get_parse_tree(content, namespaces, context)
-        except ParserError:
-            return convert_linefeeds(content, as_text), sem.pull()
-    # parse BB Codes
-    content = head.parse(as_text=as_text)
-    # Replace linefeeds
-    content = convert_linefeeds(content, as_text)
-    return content, sem.pull()
+        fragments = head.iter_parse(as_text=as_text)
+    profile = parse_context.profile
+    if profile is not None:
+        # render up front to time it apart from the linefeed pass
+        started = timer()
+        fragments = list(fragments)
+        profile.add_phase('render', started, sum(len(fragment or '') for fragment in fragments))
+        started = timer()
+        fragments = list(iter_convert_linefeeds(fragments, as_text))
+        profile.add_phase('linefeeds', started, sum(len(fragment) for fragment in fragments))
+    else:
+        fragments = iter_convert_linefeeds(fragments, as_text)
+    rendered = [] if cache else None
+    for fragment in fragments:
+        if rendered is not None:
+            rendered.append(fragment)
+        yield fragment
+    pulled = parse_context.pull()
+    if errors is not None:
+        errors.extend(pulled)
+    if cache and (head is None or head.cacheable):
+        cache.set(key, (''.join(rendered), pulled, head is None))
+
+def render_to(sink, content, namespaces=None, strict=True, auto_discover=False,
+              context=None, as_text=False, cache=None, budget=None):
+    """
+    Parse a content with the BBCodes and write it to a file-like object (eg a
+    StringIO or a django HttpResponse). Returns the errors.
+    """
+    errors = []
+    for fragment in iter_render(content, namespaces, strict, auto_discover,
+                                context, as_text, cache, errors, None, budget):
+        sink.write(fragment)
+    return errors
+
+def parse(content, namespaces=None, strict=True, auto_discover=False,
+          context=None, as_text=False, cache=None, budget=None):
+    """
+    Parse a content with the BBCodes
+    
+    'cache' is a bbcode.cache.RenderCache, False to bypass caching or None to
+    use the cache configured by the BBCODE_RENDER_CACHE setting.
+    
+    'budget' limits the bytes, tags, nesting depth and time of the parse,
+    see get_budget.
+    """
+    errors = []
+    parsed = ''.join(iter_render(content, namespaces, strict, auto_discover,
+                                 context, as_text, cache, errors, None, budget))
+    return parsed, errors
+
+def parse_chunk(contents, namespaces, strict, context, as_text, cache, budget=None):
+    # build all trees first, so their tags are resolved together
+    prefetcher = Prefetcher()
+    renders = []
+    for content in contents:
+        errors = []
+        renders.append((iter_render(content, namespaces, strict, False, context,
+                                    as_text, cache, errors, prefetcher, budget), errors))
+    return [(''.join(fragments), errors) for fragments, errors in renders]
+
+def validate_chunk(contents, namespaces, budget=None):
+    return [lib.validate(content, namespaces, budget=budget) for content in contents]
+
+def map_chunks(function, contents, args, executor=None, workers=None, chunksize=32):
+    """
+    Call function(chunk, *args) on chunks of the contents, in this process or
+    on a concurrent.futures executor, and return the joined results in order.
+    If workers is given and no executor, a process pool is used for the call.
+    """
+    if executor is None and workers and workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(workers) as executor:
+            return map_chunks(function, contents, args, executor, None, chunksize)
+    contents = list(contents)
+    if executor is None:
+        results = []
+        for index in range(0, len(contents), chunksize):
+            results.extend(function(contents[index:index + chunksize], *args))
+        return results
+    futures = [executor.submit(function, contents[index:index + chunksize], *args)
+               for index in range(0, len(contents), chunksize)]
+    results = []
+    for future in futures:
+        results.extend(future.result())
+    return results
+
+def parse_many(contents, namespaces=None, strict=True, auto_discover=False,
+               context=None, as_text=False, cache=None, executor=None,
+               workers=None, chunksize=32, budget=None):
+    """
+    Parse several contents with the BBCodes and return a list of (parsed,
+    errors) tuples in the same order. The namespaces, tag profile and render
+    cache are looked up once for the whole batch.
+    
+    The contents are parsed in this process unless a concurrent.futures
+    'executor' is given, or 'workers' to use a temporary process pool (this
+    needs the 'futures' backport on python 2), which get the contents in
+    chunks of 'chunksize'. Worker processes must have the
+    same tags registered (they do when forked) and use their own render cache
+    unless 'cache' is False, 'context' must be picklable.
+    """
+    if auto_discover:
+        autodiscover()
+    if namespaces is None:
+        namespaces = get_default_namespaces()
+    namespaces = frozenset(namespaces)
+    if executor is not None or (workers and workers > 1):
+        cache = False if cache is False else None
+    elif cache is None:
+        cache = get_render_cache()
+    return map_chunks(parse_chunk, contents, (namespaces, strict, context, as_text, cache, budget),
+                      executor, workers, chunksize)
+
+def validate_many(contents, namespaces=None, auto_discover=False, executor=None,
+                  workers=None, chunksize=32, budget=None):
+    """
+    Validate several contents, returns a list of errors in the same order. See
+    parse_many for the executor, workers and chunksize arguments.
+    """
+    if auto_discover:
+        autodiscover()
+    if namespaces is None:
+        namespaces = get_default_namespaces()
+    return map_chunks(validate_chunk, contents, (frozenset(namespaces), budget),
+                      executor, workers, chunksize)
     
 def autodiscover():
     """
     Automatically register all bbcode tags. This searches the 'bbtags' modules
-    of all INSTALLED_APPS if available.
+    of all INSTALLED_APPS if available, they are imported when the tags are
+    first needed.
     """
     global AUTODISCOVERED
     if AUTODISCOVERED:
         return
-    import imp
+    from bbcode.compat import find_module
     from django.conf import settings
     import os
 
@@ -755,11 +1953,15 @@ def autodiscover():
         except AttributeError:
             continue
         try:
-            imp.find_module('bbtags', app_path)
+            find_module('bbtags', app_path)
         except ImportError:
             continue
         for f in os.listdir(os.path.join(os.path.dirname(os.path.abspath(module.__file__)), 'bbtags')):
             mod_name, ext = os.path.splitext(f)
             if ext == '.py':
-                __import__("%s.bbtags.%s" % (app, mod_name))
-    AUTODISCOVERED = True
\ No newline at end of file
+                lib.defer("%s.bbtags.%s" % (app, mod_name))
+    AUTODISCOVERED = True
+
+# bbcode.aio needs python 3.7
+if sys.version_info >= (3, 7):
+    from bbcode.aio import aparse
\ No newline at end of file
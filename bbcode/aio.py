@@ -0,0 +1,64 @@
+"""
+Async rendering for asyncio (python 3.7+).
+
+parsed, errors = await bbcode.aparse(content)
+
+The parse tree is built in the event loop, then the data of its tags is looked
+up with one call per resolver, all resolvers at once: resolvers registered
+with bbcode.register_async_resolver are awaited, the others are called in the
+executor. The tree is rendered in the executor as well, so highlighting code
+does not block the event loop.
+"""
+import asyncio
+from bbcode import lib, iter_render, Prefetcher
+
+
+async def resolve(prefetcher, executor=None):
+    """
+    Resolve the pending keys of a prefetcher concurrently.
+    """
+    loop = asyncio.get_running_loop()
+    names, lookups = [], []
+    for name in list(prefetcher.pending):
+        keys, missing = prefetcher.take(name)
+        if not missing:
+            prefetcher.store(name, keys, {})
+            continue
+        resolve_many = lib.get_async_resolver(name)
+        if resolve_many is None:
+            lookup = loop.run_in_executor(executor, lib.get_resolver(name), missing)
+        else:
+            lookup = resolve_many(missing)
+        names.append((name, keys))
+        lookups.append(lookup)
+    for (name, keys), values in zip(names, await asyncio.gather(*lookups)):
+        prefetcher.store(name, keys, values)
+
+async def aparse(content, namespaces=None, strict=True, auto_discover=False,
+                 context=None, as_text=False, cache=None, budget=None,
+                 executor=None):
+    """
+    Parse a content with the BBCodes like bbcode.parse, without blocking the
+    event loop. 'executor' is the concurrent.futures executor rendering the
+    content and calling the resolvers without an async variant, by default
+    the loop's one.
+    """
+    loop = asyncio.get_running_loop()
+    prefetcher = Prefetcher()
+    errors = []
+    fragments = iter_render(content, namespaces, strict, auto_discover, context,
+                            as_text, cache, errors, prefetcher, budget)
+    await resolve(prefetcher, executor)
+    parsed = await loop.run_in_executor(executor, ''.join, fragments)
+    return parsed, errors
+
+async def resolve_quotes(content_ids):
+    """
+    Async variant of the default quote resolver, reads the quoted articles
+    concurrently.
+    """
+    from bbcode.bbtags.blocks import read_quote
+    loop = asyncio.get_running_loop()
+    values = await asyncio.gather(*[loop.run_in_executor(None, read_quote, content_id)
+                                    for content_id in content_ids])
+    return dict(zip(content_ids, values))
@@ -10,6 +10,8 @@ class Center(BlockReplaceTagNode):
     
     [code lang=bbdocs linenos=0][center]Text[/center][/code]
     """
+    __slots__ = ()
+
     verbose_name = 'Center Text'
     open_pattern = re.compile(patterns.no_argument % 'center')
     close_pattern = re.compile(patterns.closing % 'center')
@@ -27,6 +29,8 @@ class Left(BlockReplaceTagNode):
     
     [code lang=bbdocs linenos=0][left]Text[/left][/code]
     """
+    __slots__ = ()
+
     verbose_name = 'Align Text Left'
     open_pattern = re.compile(patterns.no_argument % 'left')
     close_pattern = re.compile(patterns.closing % 'left')
@@ -44,6 +48,8 @@ class Right(BlockReplaceTagNode):
     
     [code lang=bbdocs linenos=0][right]Text[/right][/code]
     """
+    __slots__ = ()
+
     verbose_name = 'Align Text Right'
     open_pattern = re.compile(patterns.no_argument % 'right')
     close_pattern = re.compile(patterns.closing % 'right')
@@ -61,6 +67,8 @@ class Justify(BlockReplaceTagNode):
     
     [code lang=bbdocs linenos=0][justify]Text[/justify][/code]
     """
+    __slots__ = ()
+
     verbose_name = 'Justify Text'
     open_pattern = re.compile(patterns.no_argument % 'justify')
     close_pattern = re.compile(patterns.closing % 'justify')
@@ -1,15 +1,26 @@
 from datetime import date
 from bbcode import *
+from bbcode.cache import get_highlight_cache
 import re
 
-# Pygments if available
-try:
-    from pygments import highlight
-    from pygments.lexers import guess_lexer, get_lexer_by_name, TextLexer
-    from pygments.util import ClassNotFound
-    from bbcode.mypygments import CodeHtmlFormatter
-except ImportError:
-    highlight = None
+PYGMENTS = None
+
+def load_pygments():
+    """
+    Pygments is only imported when the first code block is rendered. Returns
+    the highlight function and the bbcode.mypygments module, or False if
+    pygments is not available.
+    """
+    global PYGMENTS
+    if PYGMENTS is None:
+        try:
+            from pygments import highlight
+            from bbcode import mypygments
+        except ImportError:
+            PYGMENTS = False
+        else:
+            PYGMENTS = highlight, mypygments
+    return PYGMENTS
 
 
 class P(BlockReplaceTagNode):
@@ -20,6 +31,8 @@ class P(BlockReplaceTagNode):
 
     [code lang=bbdocs linenos=0][p]Text[/p][/code]
     """
+    __slots__ = ()
+
     verbose_name = 'Paragraph'
     open_pattern = re.compile(patterns.no_argument % 'p')
     close_pattern = re.compile(patterns.closing % 'p')
@@ -33,16 +46,23 @@ class Quote(BlockTagNode):
 
     [code lang=bbdocs linenos=0][quote=content_id]Text[/quote][/code]
     """
+    __slots__ = ()
+
     verbose_name = 'Quote'
+    # Author and page data change independently of the content
+    cacheable = False
+    # The content data of all quotes is looked up at once
+    resolver = 'quote'
     open_pattern = re.compile(r'(\[quote=(?P<content_id>[^\]]+)\])')
     close_pattern = re.compile(patterns.closing % 'quote')
 
+    def get_resolver_key(self):
+        return self.match.groupdict().get('content_id')
+
     def get_quote(self, content_id):
-        try:
-            from _index.helpers import read_content_data
-        except ImportError:
+        content_data = self.get_resolved(content_id)
+        if not content_data:
             return {}
-        content_data = read_content_data(content_id)
         quote = {
             'author_avatar': content_data['author']['avatar'],
             'author_rank': content_data['author']['rank'],
@@ -89,6 +109,31 @@ class Quote(BlockTagNode):
         if as_text: return self.parse_inner(as_text)
         return self.build_html(content_id, self.parse_inner())
 
+    def check(self):
+        # the quoted content is not looked up
+        if self.match.groupdict().get('content_id', None) is None:
+            return self.soft_raise("No article ID attached to the quote.")
+        BlockTagNode.check(self)
+
+
+def read_quote(content_id):
+    """
+    Reads the content data of a quoted article, None if it is not available.
+    """
+    try:
+        from _index.helpers import read_content_data
+    except ImportError:
+        return None
+    return read_content_data(content_id)
+
+
+def resolve_quotes(content_ids):
+    """
+    Default quote resolver, reads the content data of each quoted article.
+    Set BBCODE_RESOLVERS = {'quote': 'path.to.function'} to use a bulk lookup.
+    """
+    return dict((content_id, read_quote(content_id)) for content_id in content_ids)
+
 
 class Code(BlockTagNode):
     """
@@ -102,6 +147,8 @@ class Code(BlockTagNode):
 
     Allowed [i]languages[/i]: http://pygments.org/languages/ Default: autodetect
     """
+    __slots__ = ('arguments',)
+
     verbose_name = 'Code'
     open_pattern = re.compile(r'\[code\]|\[code=(?P<language>[^\]]+)\]')
     close_pattern = re.compile(patterns.closing % 'code')
@@ -115,10 +162,13 @@ class Code(BlockTagNode):
             kwargs['language'] = gd['language']
         self.arguments = kwargs
 
-    def build_html(self, language, copyright, highlighted):
-        code_counts = ''
-        for i in range(1, highlighted.count('code-line') + 1):
-            code_counts += u'<a href="#L{i}" rel="#L{i}">{i}</a>'.format(i=i)
+    def build_counts(self, highlighted):
+        return u''.join(u'<a href="#L{i}" rel="#L{i}">{i}</a>'.format(i=i)
+                        for i in range(1, highlighted.count('code-line') + 1))
+
+    def build_html(self, language, copyright, highlighted, code_counts=None):
+        if code_counts is None:
+            code_counts = self.build_counts(highlighted)
 
         return  u'<div class="block-code" data-language="{language}" data-copyright="{copyright}">'\
                     '<div class="code-head">'\
@@ -142,29 +192,45 @@ class Code(BlockTagNode):
         """
         pygment highlighting
         """
-        inner = ''
+        inner = ''.join(node.raw_content for node in self.nodes)
         language = self.arguments['language']
-        for node in self.nodes:
-            inner += node.raw_content
-        if highlight is None:
+        pygments = load_pygments()
+        if not pygments:
             return '<pre>%s</pre>' % inner
+        if as_text: return ''
+        mypygments = pygments[1]
+        lexer = None
         if language:
-            try:
-                lexer = get_lexer_by_name(language)
-            except ClassNotFound:
-                try:
-                    lexer = guess_lexer(inner)
-                except ClassNotFound:
-                    lexer = TextLexer()
-        else:
-            try:
-                lexer = guess_lexer(inner)
-            except ClassNotFound:
-                lexer = TextLexer()
+            lexer = mypygments.get_lexer_by_alias(language)
+        if lexer is None:
+            lexer = mypygments.guess_lexer(inner)
         copyright=u'(c) {year} Waaave - %s'.format(year=date.today().year)
-        highlighted = highlight(inner, lexer, CodeHtmlFormatter())
-        if as_text: return ''
-        return self.build_html(language=language, copyright=copyright, highlighted=highlighted)
+        highlighted, code_counts = self.get_highlighted(inner, lexer)
+        return self.build_html(language=language, copyright=copyright, highlighted=highlighted,
+                               code_counts=code_counts)
+
+    def check(self):
+        # the code is neither parsed nor highlighted
+        pass
+
+    def get_highlighted(self, code, lexer):
+        """
+        Returns the highlighted code and its line number gutter, from the
+        highlight cache if possible.
+        """
+        highlight, mypygments = load_pygments()
+        formatter = mypygments.CodeHtmlFormatter()
+        cache = get_highlight_cache()
+        if cache:
+            key = cache.get_key(code, lexer, formatter)
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+        highlighted = highlight(code, lexer, formatter)
+        result = highlighted, self.build_counts(highlighted)
+        if cache:
+            cache.set(key, result)
+        return result
 
 
 class Info(BlockReplaceTagNode):
@@ -175,6 +241,8 @@ class Info(BlockReplaceTagNode):
 
     [code lang=bbdocs linenos=0][info]Text[/info][/code]
     """
+    __slots__ = ()
+
     verbose_name = 'Information Block'
     open_pattern = re.compile(patterns.no_argument % 'info')
     close_pattern = re.compile(patterns.closing % 'info')
@@ -198,6 +266,8 @@ class Danger(Info):
 
     [code lang=bbdocs linenos=0][danger]Text[/danger][/code]
     """
+    __slots__ = ()
+
     verbose_name = 'Danger Block'
     open_pattern = re.compile(patterns.no_argument % 'danger')
     close_pattern = re.compile(patterns.closing % 'danger')
@@ -215,6 +285,8 @@ class Warning(Info):
 
     [code lang=bbdocs linenos=0][warning]Text[/warning][/code]
     """
+    __slots__ = ()
+
     verbose_name = 'Warning Block'
     open_pattern = re.compile(patterns.no_argument % 'warning')
     close_pattern = re.compile(patterns.closing % 'warning')
@@ -226,6 +298,9 @@ class Warning(Info):
 
 register(P)
 register(Quote)
+register_resolver('quote', resolve_quotes)
+# reads the articles concurrently in bbcode.aio.aparse
+register_async_resolver('quote', 'bbcode.aio.resolve_quotes')
 register(Code)
 register(Info)
 register(Danger)
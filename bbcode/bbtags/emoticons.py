@@ -2,105 +2,96 @@ from bbcode import *
 import re
 
 
+# Emoticon name (used in the css class) and its codes. Use add_emoticon to
+# add one.
+EMOTICONS = [
+    ('smiling', [':)', ':-)']),
+    ('blink', [';)', ';-)']),
+    ('laughing', [':D', ':-D']),
+    ('yuck', [':P', ':-P', ':p', ':-p']),
+    ('sad', [':(', ':-(']),
+    ('embarrassed', [':S', ':-S', ':s', ':-s']),
+    ('slant', [':/', ':-/']),
+    ('ambivalent', [':|', ':-|']),
+    ('notamused', ["--'", '--"']),
+    ('crying', [":'(", ":-'("]),
+    ('cool', ['B)', 'B-)']),
+    ('angry', [':@', ':-@']),
+    ('naughty', ['3:)', '3:-)']),
+    ('angel', ['o:)', 'o:-)']),
+    ('nerd', ['8)', '8-)']),
+    ('moneymouth', [':$', ':-$']),
+    ('thumbsup', [':+1:']),
+    ('thumbsdown', [':-1:']),
+]
+
+CODES = {}
+PATTERN = None
+
+def build_trie_pattern(codes):
+    """
+    Build a regular expression matching the longest of the codes at a
+    position. The codes are put in a trie, so the pattern only has one branch
+    per first character however many codes there are.
+    """
+    trie = {}
+    for code in codes:
+        node = trie
+        for char in code:
+            node = node.setdefault(char, {})
+        node[''] = {}
+    def to_regex(node):
+        end = '' in node
+        branches = [re.escape(char) + to_regex(child)
+                    for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        if len(branches) == 1 and not end:
+            return branches[0]
+        # greedy, so longer codes are tried first
+        return '(?:%s)%s' % ('|'.join(branches), '?' if end else '')
+    return to_regex(trie)
+
+def get_pattern():
+    global CODES, PATTERN
+    if PATTERN is None:
+        # swapped in whole, renders running meanwhile keep a complete table
+        codes = {}
+        for name, em_codes in EMOTICONS:
+            for code in em_codes:
+                codes[code] = name
+        pattern = re.compile(build_trie_pattern(codes))
+        CODES = codes
+        PATTERN = pattern
+    return PATTERN
+
+def add_emoticon(name, *codes):
+    """
+    Add codes for an emoticon, rendered with the css class 'emoticon-<name>'.
+    """
+    global PATTERN
+    EMOTICONS.append((name, list(codes)))
+    PATTERN = None
+    lib.invalidate()
+
+
 class Emoticon(SelfClosingTagNode):
+    """
+    Replaces the codes of the EMOTICONS table, preferring the longest code.
+    """
+    __slots__ = ('em_name',)
+
+    @staticmethod
+    def open_pattern():
+        return get_pattern()
+
     def __init__(self, *args, **kwargs):
-        if not hasattr(self, 'em_name'):
-            self.em_name = self.__class__.__name__.lower()
         SelfClosingTagNode.__init__(self, *args, **kwargs)
+        self.em_name = CODES.get(self.raw_content)
 
     def parse(self, as_text=False):
         if as_text: return ''
         return u'<span class="emoticon emoticon-%s"></span>' % self.em_name
 
 
-class Smiling(Emoticon):
-    # :), :-)
-    open_pattern = re.compile(':-?\)')
-
-class Blink(Emoticon):
-    # ;), ;-)
-    open_pattern = re.compile(';-?\)')
-
-class Laughing(Emoticon):
-    # :D, :-D
-    open_pattern = re.compile(':-?D')
-
-class Yuck(Emoticon):
-    # :P, :-P
-    open_pattern = re.compile(':-?(P|p)')
-
-class Sad(Emoticon):
-    # :(, :-(
-    open_pattern = re.compile(':-?\(')
-
-class Embarrassed(Emoticon):
-    # :S, :-S
-    open_pattern = re.compile(":-?(S|s)")
-
-class Slant(Emoticon):
-    # :/, :-/
-    open_pattern = re.compile(":-?\/")
-
-class Ambivalent(Emoticon):
-    # :|, :-|
-    open_pattern = re.compile(":-?\|")
-
-class NotAmused(Emoticon):
-    # --', --"
-    open_pattern = re.compile("--(\'|\")")
-
-class Crying(Emoticon):
-    # :'(, :'-(
-    open_pattern = re.compile(':-?\'\(')
-
-class Cool(Emoticon):
-    # B), B-)
-    open_pattern = re.compile('B-?\)')
-
-class Angry(Emoticon):
-    # :@, :-@
-    open_pattern = re.compile(':-?@')
-
-class Naughty(Emoticon):
-    # 3:), 3:-)
-    open_pattern = re.compile('3:-?\)')
-
-class Angel(Emoticon):
-    # o:), o:-)
-    open_pattern = re.compile('o:-?\)')
-
-class Nerd(Emoticon):
-    # 8), 8-)
-    open_pattern = re.compile('8-?\)')
-
-class MoneyMouth(Emoticon):
-    # :$, :-$
-    open_pattern = re.compile(':-?\$')
-
-class ThumbsUp(Emoticon):
-    # :+1:
-    open_pattern = re.compile(':\+1:')
-
-class ThumbsDown(Emoticon):
-    # :-1:
-    open_pattern = re.compile(':-1:')
-
-
-register(Smiling)
-register(Blink)
-register(Laughing)
-register(Yuck)
-register(Sad)
-register(Embarrassed)
-register(Slant)
-register(Ambivalent)
-register(NotAmused)
-register(Crying)
-register(Cool)
-register(Angry)
-register(Naughty)
-register(Angel)
-register(Nerd)
-register(MoneyMouth)
-register(ThumbsUp)
-register(ThumbsDown)
\ No newline at end of file
+register(Emoticon)
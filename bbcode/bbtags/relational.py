@@ -1,7 +1,6 @@
 from bbcode import *
 import re
-import urllib
-from urlparse import urlparse
+from bbcode.compat import urlparse, quote
 from django.conf import settings
 
 
@@ -14,31 +13,49 @@ class Url(TagNode):
     [code lang=bbdocs linenos=0][url=<http://www.domain.com>]Text[/url]
 [url]http://www.domain.com[/url][/code]
     """
+    __slots__ = ()
+
     verbose_name = 'Link'
     open_pattern = re.compile(r'(\[url\]|\[url="?(?P<href>[^\]]+)"?\]|\[url (?P'
-                               '<arg1>\w+)="?(?P<val1>[^ ]+)"?( (?P<arg2>\w+)="'
-                               '?(?P<val2>[^ ]+)"?)?\])')
+                               r'<arg1>\w+)="?(?P<val1>[^ ]+)"?( (?P<arg2>\w+)="'
+                               r'?(?P<val2>[^ ]+)"?)?\])')
     close_pattern = re.compile(patterns.closing % 'url')
     
-    def parse(self, as_text=False):
+    def get_arguments(self):
+        """
+        The groups of the match, with the values of the name=value arguments
+        under their names.
+        """
         gd = self.match.groupdict()
         gd.update({'css':''})
         if gd['arg1']:
             gd[gd['arg1']] = gd['val1']
         if gd['arg2']:
             gd[gd['arg2']] = gd['val2']
+        return gd
+    
+    def get_href(self, gd):
+        """
+        The href argument, or the text of the tag without one, in which case
+        nested tags are soft raised.
+        """
+        if gd['href']:
+            return self.variables.resolve(gd['href'])
+        inner = ''
+        for node in self.nodes:
+            if node.is_text_node or isinstance(node, AutoDetectURL):
+                inner += node.raw_content
+            else:
+                self.soft_raise("Url tag cannot have nested tags without "
+                                "an argument.")
+        return self.variables.resolve(inner)
+    
+    def parse(self, as_text=False):
+        gd = self.get_arguments()
+        href = self.get_href(gd)
         if gd['href']:
-            href = self.variables.resolve(gd['href'])
             inner = self.parse_inner(as_text)
         else:
-            inner = ''
-            for node in self.nodes:
-                if node.is_text_node or isinstance(node, AutoDetectURL):
-                    inner += node.raw_content
-                else:
-                    self.soft_raise("Url tag cannot have nested tags without "
-                                    "an argument.")
-            href = self.variables.resolve(inner)
             inner = href
         if gd['css']:
             css = ' class="%s"' % gd['css'].replace(',',' ')
@@ -47,7 +64,10 @@ class Url(TagNode):
         raw_href = self.variables.resolve(href)
 
         # url escape
-        raw_href = urlparse(raw_href)
+        try:
+            raw_href = urlparse(raw_href)
+        except ValueError:
+            return self.soft_raise("'%s' is not a valid url" % raw_href)
         path =  raw_href.netloc + raw_href.path
         if raw_href.params:
             path += ";" + raw_href.params
@@ -55,12 +75,23 @@ class Url(TagNode):
             path += "?" + raw_href.query
         if raw_href.fragment:
             path += "#" + raw_href.fragment
-        href_escaped = raw_href.scheme + "://" + urllib.quote(path)
+        href_escaped = raw_href.scheme + "://" + quote(path)
 
         css = self.variables.resolve(css)
         if as_text: return inner
         return u'<a target="_blank" href="%s"%s>%s</a>' % (href_escaped, css, inner)
     
+    def check(self):
+        gd = self.get_arguments()
+        href = self.get_href(gd)
+        if gd['href']:
+            TagNode.check(self)
+        raw_href = self.variables.resolve(href)
+        try:
+            urlparse(raw_href)
+        except ValueError:
+            self.soft_raise("'%s' is not a valid url" % raw_href)
+    
 
 class Email(TagNode):
     """
@@ -71,6 +102,8 @@ class Email(TagNode):
     [code lang=bbdocs linenos=0][email]name@domain.com[/email]
 [email=<name@domain.com>]Text[/email][/code]
     """
+    __slots__ = ()
+
     verbose_name = 'E-Mail'
     open_pattern = re.compile(r'(\[email\]|\[email=(?P<mail>[^\]]+\]))')
     close_pattern = re.compile(patterns.closing % 'email')
@@ -93,6 +126,10 @@ class Email(TagNode):
                 inner += node.raw_content
             return u'<a href="mailto:%s">%s</a>' % (inner, inner)
     
+    def check(self):
+        # the address is used as it is
+        pass
+    
     
 
     
@@ -110,6 +147,8 @@ class Img(ArgumentTagNode):
     
     Allowed values for [i]align[/i]: left, center, right. Default: None.
     """
+    __slots__ = ()
+
     verbose_name = 'Image'
     open_pattern = re.compile(patterns.single_argument % 'img')
     close_pattern = re.compile(patterns.closing % 'img')
@@ -121,7 +160,7 @@ class Img(ArgumentTagNode):
             if node.is_text_node or isinstance(node, AutoDetectURL):
                 inner += node.raw_content
             else:
-                soft_raise("Img tag cannot have nested tags without an argument.")
+                self.soft_raise("Img tag cannot have nested tags without an argument.")
                 return self.raw_content
         inner = self.variables.resolve(inner)
         image_url = '%s/%s' % (settings.MEDIA_URL.strip('/'), inner.strip('/'),)
@@ -130,6 +169,12 @@ class Img(ArgumentTagNode):
         else:
             return u'<img src="%s" alt="image" />' % image_url
     
+    def check(self):
+        for node in self.nodes:
+            if not (node.is_text_node or isinstance(node, AutoDetectURL)):
+                self.soft_raise("Img tag cannot have nested tags without an argument.")
+                return
+    
     
 class Youtube(BlockTagNode):
     """
@@ -139,28 +184,35 @@ class Youtube(BlockTagNode):
     
     [code lang=bbdocs linenos=0][youtube]http://www.youtube.com/watch?v=FjPf6B8EVJI[/youtube][/code]
     """
-    _video_id_pattern = re.compile('v=(\w+)')
+    __slots__ = ()
+
+    _video_id_pattern = re.compile(r'v=(\w+)')
     open_pattern = re.compile(patterns.no_argument % 'youtube')
     close_pattern = re.compile(patterns.closing % 'youtube')
     
-    def parse(self, as_text=False):
+    def get_video_id(self):
+        """
+        The id of the video linked in the tag, None (soft raised) if there is
+        none or the tag has nested tags.
+        """
         url = ''
-        if as_text: return url
         for node in self.nodes:
             if node.is_text_node or isinstance(node, AutoDetectURL):
-                inner += node.raw_content
+                url += node.raw_content
             else:
-                soft_raise("Youtube tag cannot have nested tags")
-                return self.raw_content
+                self.soft_raise("Youtube tag cannot have nested tags")
+                return None
         match = self._video_id_pattern.search(url)
         if not match:
-            soft_raise("'%s' does not seem like a youtube link" % url)
-            return self.raw_content
-        videoid = match.groups()
-        if not videoid:
-            soft_raise("'%s' does not seem like a youtube link" % url)
+            self.soft_raise("'%s' does not seem like a youtube link" % url)
+            return None
+        return match.group(1)
+    
+    def parse(self, as_text=False):
+        if as_text: return ''
+        videoid = self.get_video_id()
+        if videoid is None:
             return self.raw_content
-        videoid = videoid[0]
         return (
             u'<object width="560" height="340"><param name="movie" value="http:/'
             '/www.youtube.com/v/%s&amp;hl=en&amp;fs=1&amp;"></param><param name'
@@ -168,7 +220,11 @@ class Youtube(BlockTagNode):
             'cess" value="always"></param><embed src="http://www.youtube.com/v/'
             '%s&amp;hl=en&amp;fs=1&amp;" type="application/x-shockwave-flash" a'
             'llowscriptaccess="always" allowfullscreen="true" width="560" heigh'
+            't="340"></embed></object>' % (videoid, videoid)
         )
+    
+    def check(self):
+        self.get_video_id()
 
 
 class Download(BlockTagNode):
@@ -179,6 +235,8 @@ class Download(BlockTagNode):
      
     [code lang=bbdocs linenos=0][download=<file_path>]Download Title[/url][/code]
     """
+    __slots__ = ()
+
     verbose_name = 'Download'
     open_pattern = re.compile(r'(\[download="?(?P<path>[^\]]+)"?\])')
     close_pattern = re.compile(patterns.closing % 'download')
@@ -196,10 +254,17 @@ class Download(BlockTagNode):
                   '<span class="text-block">Click on the following link to download <a href="{path}">{title}</a>.</span>' \
                   '<div class="clear"></div>'                                                                             \
                '</div>'.format(path=path_absolute, title=title)
+    
+    def check(self):
+        if not self.match.groupdict()['path']:
+            return self.soft_raise("Download tag must have a file path attribute.")
+        BlockTagNode.check(self)
 
     
 class AutoDetectURL(SelfClosingTagNode):
-    open_pattern = re.compile('((ht|f)tps?:\/\/([-\w\.]+)+(:\d+)?(\/([\w\/_\.,-]*(\?\S+)?)?)?)')
+    __slots__ = ()
+
+    open_pattern = re.compile(r'((ht|f)tps?:\/\/[-\w\.]+(:\d+)?(\/([\w\/_\.,-]*(\?\S+)?)?)?)')
 
     def parse(self, as_text=False):
         url = self.match.group()
@@ -13,6 +13,8 @@ class OL(BlockMultiArgumentTagNode):
   [*] Second item
 [/ol][/code]
     """
+    __slots__ = ()
+
     _arguments = {'css': '',
                   'itemcss': ''}
     
@@ -34,12 +36,9 @@ class OL(BlockMultiArgumentTagNode):
         else:
             css = ''
         items = self.parse_inner(as_text).split('[*]')[1:]
-        real = ''
         if as_text:
-            for item in items: real += '- %s' % item
-        else:
-            for item in items: real += '<li%s>%s</li>' % (css, item)
-        return real
+            return ''.join('- %s' % item for item in items)
+        return ''.join('<li%s>%s</li>' % (css, item) for item in items)
         
     def parse(self, as_text=False):
         if as_text: return self.list_parse(as_text)
@@ -61,6 +60,8 @@ class UL(OL):
   [*] Second item
 [/ul][/code]
     """
+    __slots__ = ()
+
     @staticmethod
     def open_pattern():
         pat = r'\[ul'
@@ -90,6 +91,8 @@ class Steps(BlockTagNode):
   [step=1]text[/step]
 [/steps][/code]
     """
+    __slots__ = ()
+
     open_pattern = re.compile(patterns.no_argument % 'steps')
     close_pattern = re.compile(patterns.closing % 'steps')
     
@@ -99,9 +102,16 @@ class Steps(BlockTagNode):
             if isinstance(node, Step):
                 inner += node.parse()
             elif node.raw_content.strip():
-                soft_raise("Only step elements are allowed directly nested inside a steps element")
+                self.soft_raise("Only step elements are allowed directly nested inside a steps element")
         if as_text: return inner
         return u'<div class="steps">%s</div>' % inner
+    
+    def check(self):
+        for node in self.nodes:
+            if isinstance(node, Step):
+                node.check()
+            elif node.raw_content.strip():
+                self.soft_raise("Only step elements are allowed directly nested inside a steps element")
 
 
 class Step(BlockTagNode):
@@ -116,6 +126,8 @@ class Step(BlockTagNode):
     
     [i]number[/i]: must be digit. Default: 1 (normal)
     """
+    __slots__ = ('argument',)
+
     open_pattern = re.compile(r'(\[step\]|\[step="?(?P<argument>[^]]+)?"?\])')
     close_pattern = re.compile(patterns.closing % 'step')
     
@@ -129,13 +141,13 @@ class Step(BlockTagNode):
     def parse(self, as_text=False):
         step_num = 1
         if not isinstance(self.parent, Steps):
-            soft_raise("Step are only allowed within a steps list!")
+            self.soft_raise("Step are only allowed within a steps list!")
             return self.raw_content
         if self.argument:
             if self.argument.isdigit():
                 step_num = self.argument
             else:
-                soft_fail("Step argument must be digit")
+                self.soft_raise("Step argument must be digit")
         if as_text:
             return '%s. %s' % (step_num, self.parse_inner(as_text))
         return u'<div class="step">'               \
@@ -143,6 +155,13 @@ class Step(BlockTagNode):
                   '<span class="value">%s</span>' \
                   '<div class="clear"></div>'     \
                '</div>' % (step_num, self.parse_inner())
+    
+    def check(self):
+        if not isinstance(self.parent, Steps):
+            return self.soft_raise("Step are only allowed within a steps list!")
+        if self.argument and not self.argument.isdigit():
+            self.soft_raise("Step argument must be digit")
+        BlockTagNode.check(self)
 
 register(OL)
 register(UL)
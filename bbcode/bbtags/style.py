@@ -10,6 +10,8 @@ class Em(ReplaceTagNode):
     
     [code lang=bbdocs linenos=0][i]Text[/i][/code]
     """
+    __slots__ = ()
+
     verbose_name = 'Italic'
     open_pattern = re.compile(patterns.no_argument % 'i')
     close_pattern = re.compile(patterns.closing % 'i')
@@ -23,6 +25,8 @@ class Strong(ReplaceTagNode):
     
     [code lang=bbdocs linenos=0][b]Text[/b][/code]
     """
+    __slots__ = ()
+
     verbose_name = 'Bold'
     open_pattern = re.compile(patterns.no_argument % 'b')
     close_pattern = re.compile(patterns.closing % 'b')
@@ -36,6 +40,8 @@ class U(ReplaceTagNode):
     
     [code lang=bbdocs linenos=0][u]Text[/u][/code]
     """
+    __slots__ = ()
+
     verbose_name = 'Underline'
     open_pattern = re.compile(patterns.no_argument % 'u')
     close_pattern = re.compile(patterns.closing % 'u')
@@ -49,6 +55,8 @@ class H1(BlockArgumentTagNode):
     
     [code lang=bbdocs linenos=0][h1]Text[/h1][/code]
     """
+    __slots__ = ()
+
     vebose_name = 'H1 Heading'
     open_pattern = re.compile(patterns.single_argument % 'h1')
     close_pattern = re.compile(patterns.closing % 'h1')
@@ -69,6 +77,8 @@ class H2(H1):
     
     [code lang=bbdocs linenos=0][h2]Text[/h2][/code]
     """
+    __slots__ = ()
+
     vebose_name = 'H2 Heading'
     open_pattern = re.compile(patterns.single_argument % 'h2')
     close_pattern = re.compile(patterns.closing % 'h2')
@@ -86,6 +96,8 @@ class H3(H1):
     
     [code lang=bbdocs linenos=0][h3]Text[/h3][/code]
     """
+    __slots__ = ()
+
     vebose_name = 'H3 Heading'
     open_pattern = re.compile(patterns.single_argument % 'h3')
     close_pattern = re.compile(patterns.closing % 'h3')
@@ -103,6 +115,8 @@ class H4(H1):
     
     [code lang=bbdocs linenos=0][h4]Text[/h4][/code]
     """
+    __slots__ = ()
+
     vebose_name = 'H4 Heading'
     open_pattern = re.compile(patterns.single_argument % 'h4')
     close_pattern = re.compile(patterns.closing % 'h4')
@@ -120,6 +134,8 @@ class H5(H1):
     
     [code lang=bbdocs linenos=0][h5]Text[/h5][/code]
     """
+    __slots__ = ()
+
     vebose_name = 'H5 Heading'
     open_pattern = re.compile(patterns.single_argument % 'h5')
     close_pattern = re.compile(patterns.closing % 'h5')
@@ -137,6 +153,8 @@ class H6(H1):
     
     [code lang=bbdocs linenos=0][h6]Text[/h6][/code]
     """
+    __slots__ = ()
+
     vebose_name = 'H6 Heading'
     open_pattern = re.compile(patterns.single_argument % 'h6')
     close_pattern = re.compile(patterns.closing % 'h6')
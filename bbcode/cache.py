@@ -0,0 +1,297 @@
+"""
+Caches used by the BBCode parser.
+
+The render cache is opt-in, enable it with the BBCODE_RENDER_CACHE setting:
+
+BBCODE_RENDER_CACHE = {
+    'MAXSIZE': 1024,        # entries kept in the in-process LRU
+    'BACKEND': 'default',   # optional django cache alias shared by processes
+    'TIMEOUT': 300,         # timeout of the entries in seconds
+}
+
+The highlight cache for code blocks takes the same options from the
+BBCODE_HIGHLIGHT_CACHE setting. It is enabled by default with a MAXSIZE of
+256, set it to None to disable it.
+
+The data looked up by resolvers (eg the authors of quotes) is cached according
+to the BBCODE_RESOLVER_CACHE setting, by default in-process for 300 seconds.
+Use bbcode.invalidate_resolved to drop entries when the data changes. With a
+BACKEND the resolved values are only kept there, not in-process.
+"""
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from bbcode.compat import force_bytes
+
+MISSING = object()
+
+
+class LRUCache(object):
+    """
+    A bounded in-process cache dropping the least recently used entries, and
+    entries older than timeout seconds if given.
+    """
+    def __init__(self, maxsize=1024, timeout=None):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.data.pop(key, MISSING)
+            if entry is not MISSING and entry[0] is not None and entry[0] < time.time():
+                entry = MISSING
+            if entry is MISSING:
+                self.misses += 1
+                return default
+            self.data[key] = entry
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        expires = None
+        if self.timeout is not None:
+            expires = time.time() + self.timeout
+        with self.lock:
+            self.data.pop(key, None)
+            self.data[key] = (expires, value)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses,
+                'size': len(self.data), 'maxsize': self.maxsize}
+
+
+class DjangoCache(object):
+    """
+    Stores entries in a django cache, prefixing the keys.
+    """
+    def __init__(self, alias='default', timeout=None, prefix='bbcode'):
+        self.alias = alias
+        self.timeout = timeout
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def cache(self):
+        from django.core.cache import caches
+        return caches[self.alias]
+
+    def make_key(self, key):
+        return '%s:%s' % (self.prefix, key)
+
+    def get(self, key, default=None):
+        value = self.cache.get(self.make_key(key), MISSING)
+        if value is MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self.cache.set(self.make_key(key), value, self.timeout)
+
+    def delete(self, key):
+        self.cache.delete(self.make_key(key))
+
+    def clear(self):
+        """
+        The django cache may be shared, entries are left to expire.
+        """
+        pass
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'alias': self.alias}
+
+
+class LayeredCache(object):
+    """
+    An in-process LRU, optionally backed by a django cache. Caches of data
+    that can change set 'local_with_backend' to False, they only use the
+    shared backend when there is one so deleting an entry drops it for all
+    processes.
+    """
+    local_with_backend = True
+
+    def __init__(self, maxsize=1024, backend=None, timeout=None):
+        self.local = None
+        if backend is None or self.local_with_backend:
+            self.local = LRUCache(maxsize, timeout)
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = None
+        if self.local is not None:
+            value = self.local.get(key)
+        if value is None and self.backend is not None:
+            value = self.backend.get(key)
+            if value is not None and self.local is not None:
+                self.local.set(key, value)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        if self.local is not None:
+            self.local.set(key, value)
+        if self.backend is not None:
+            self.backend.set(key, value)
+
+    def delete(self, key):
+        if self.local is not None:
+            self.local.delete(key)
+        if self.backend is not None:
+            self.backend.delete(key)
+
+    def clear(self):
+        if self.local is not None:
+            self.local.clear()
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self):
+        stats = {'hits': self.hits, 'misses': self.misses}
+        if self.local is not None:
+            stats['local'] = self.local.stats()
+        if self.backend is not None:
+            stats['backend'] = self.backend.stats()
+        return stats
+
+
+class RenderCache(LayeredCache):
+    """
+    Caches the results of bbcode.parse. Keys are built from a digest of the
+    content, the namespaces, as_text, the active language, the default parse
+    budget and the fingerprint of the tag library, so registering tags makes
+    all older entries unreachable. Documents using a tag with
+    'cacheable = False' are never stored, the django context is not part of
+    the key.
+    """
+    def get_key(self, content, namespaces, as_text, fingerprint, budget=None):
+        # soft exception messages are translated
+        try:
+            from django.utils.translation import get_language
+        except ImportError:
+            language = ''
+        else:
+            language = get_language() or ''
+        digest = hashlib.sha1()
+        digest.update(force_bytes(fingerprint))
+        digest.update(force_bytes('\0%s\0%d\0%s\0' % (','.join(sorted(namespaces)), bool(as_text), language)))
+        if budget:
+            digest.update(force_bytes('%r\0' % ((budget.bytes, budget.tags, budget.depth, budget.ms),)))
+        digest.update(force_bytes(content))
+        return 'render:%s' % digest.hexdigest()
+
+
+class HighlightCache(LayeredCache):
+    """
+    Caches the highlighted html of code blocks. Keys are built from a digest
+    of the code and the classes and options of the lexer and the formatter.
+    """
+    def get_key(self, code, lexer, formatter):
+        digest = hashlib.sha1()
+        for obj in (lexer, formatter):
+            options = getattr(obj, 'options', {})
+            digest.update(force_bytes('%s.%s\0%r\0' % (obj.__class__.__module__, obj.__class__.__name__,
+                                                        sorted(options.items()))))
+        digest.update(force_bytes(code))
+        return 'highlight:%s' % digest.hexdigest()
+
+
+class ResolverCache(LayeredCache):
+    """
+    Caches the values returned by resolvers, by resolver name and key. With a
+    shared backend there is no in-process layer, bbcode.invalidate_resolved
+    would leave the entries of the other processes behind.
+    """
+    local_with_backend = False
+
+    def get_key(self, name, key):
+        return 'resolved:%s:%s' % (name, hashlib.sha1(force_bytes(u'%s' % key)).hexdigest())
+
+
+def get_cache_from_config(config, klass=RenderCache):
+    """
+    Builds a cache from a BBCODE_RENDER_CACHE like dictionary.
+    """
+    backend = None
+    if config.get('BACKEND'):
+        backend = DjangoCache(config['BACKEND'], config.get('TIMEOUT'))
+    return klass(config.get('MAXSIZE', 1024), backend, config.get('TIMEOUT'))
+
+
+CACHES = {}
+
+def get_configured_cache(setting, klass, default=None):
+    """
+    Get the cache configured by a setting, or False if it is disabled. The
+    setting is only read once.
+    """
+    if setting not in CACHES:
+        config = default
+        try:
+            from django.conf import settings
+            from django.core.exceptions import ImproperlyConfigured
+        except ImportError:
+            pass
+        else:
+            try:
+                config = getattr(settings, setting, default)
+            except ImproperlyConfigured:
+                pass
+        CACHES[setting] = get_cache_from_config(config, klass) if config else False
+    return CACHES[setting]
+
+def get_render_cache():
+    """
+    Get the render cache configured by the BBCODE_RENDER_CACHE setting, or
+    False if the render cache is disabled.
+    """
+    return get_configured_cache('BBCODE_RENDER_CACHE', RenderCache)
+
+def get_highlight_cache():
+    """
+    Get the highlight cache configured by the BBCODE_HIGHLIGHT_CACHE setting,
+    or False if the highlight cache is disabled.
+    """
+    return get_configured_cache('BBCODE_HIGHLIGHT_CACHE', HighlightCache, {'MAXSIZE': 256})
+
+def get_resolver_cache():
+    """
+    Get the resolver cache configured by the BBCODE_RESOLVER_CACHE setting,
+    or False if the resolver cache is disabled.
+    """
+    return get_configured_cache('BBCODE_RESOLVER_CACHE', ResolverCache,
+                                {'MAXSIZE': 1024, 'TIMEOUT': 300})
+
+def reset_caches(setting=None, **kwargs):
+    """
+    Forget a cache when its setting is overridden (eg in tests).
+    """
+    CACHES.pop(setting, None)
+
+try:
+    from django.core.signals import setting_changed
+except ImportError:
+    pass
+else:
+    setting_changed.connect(reset_caches)
@@ -0,0 +1,47 @@
+"""
+The few differences between python 2 and 3 the parser runs into.
+"""
+import sys
+
+__all__ = ['PY3', 'escape', 'find_module', 'force_bytes', 'quote', 'string_types',
+           'text_type', 'urlparse']
+
+PY3 = sys.version_info[0] >= 3
+
+if PY3:
+    import html
+    from importlib.machinery import PathFinder
+    from urllib.parse import urlparse, quote
+    string_types = (str,)
+    text_type = str
+
+    def escape(content):
+        """
+        Escape &, < and >, like cgi.escape.
+        """
+        return html.escape(content, quote=False)
+
+    def find_module(name, path):
+        """
+        Raise ImportError unless module 'name' is in 'path', like
+        imp.find_module.
+        """
+        if PathFinder.find_spec(name, path) is None:
+            raise ImportError("No module named %s" % name)
+else:
+    from cgi import escape
+    from imp import find_module
+    from urlparse import urlparse
+    from urllib import quote
+    # basestring and unicode, without names python 3 does not know
+    text_type = type(u'')
+    string_types = (str, text_type)
+
+
+def force_bytes(content):
+    """
+    Encode text to utf-8 bytes (to hash it), bytes are left as they are.
+    """
+    if isinstance(content, text_type):
+        return content.encode('utf-8')
+    return content
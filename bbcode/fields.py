@@ -1,6 +1,9 @@
 from django.db import models
 from django import forms
-validate = __import__('bbcode',level=0).validate
+from django.utils.safestring import mark_safe
+from bbcode.compat import escape
+bbmodule = __import__('bbcode',level=0)
+validate = bbmodule.validate
 
 class BBCodeTextField(models.TextField):
     """
@@ -17,15 +20,178 @@ class BBCodeCharField(models.CharField):
     """
     def formfield(self, **kwargs):
         return models.CharField.formfield(self, form_class=BBCodeFormField, **kwargs)
+
+
+class RenderedBBCodeMixin(object):
+    """
+    Renders the content when the model is saved and stores the result in
+    companion columns: '<name>_html', '<name>_text' (if render_text is True)
+    and '<name>_fingerprint', the fingerprint of the tag library used. The
+    model gets 'get_<name>_html()' and 'get_<name>_text()' methods returning
+    the stored results, or rendering the content again if the tag library
+    changed since it was saved or the content uses uncacheable tags.
+    Companion columns declared on the model (or in its migrations) are used
+    as they are. Saving the content with 'update_fields' also writes its
+    companions.
+    """
+    def __init__(self, *args, **kwargs):
+        self.render_text = kwargs.pop('render_text', False)
+        self.namespaces = kwargs.pop('namespaces', None)
+        super(RenderedBBCodeMixin, self).__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super(RenderedBBCodeMixin, self).deconstruct()
+        if self.render_text:
+            kwargs['render_text'] = True
+        if self.namespaces is not None:
+            kwargs['namespaces'] = self.namespaces
+        return name, path, args, kwargs
+
+    def get_companion_names(self):
+        names = {'html': '%s_html' % self.name,
+                 'fingerprint': '%s_fingerprint' % self.name}
+        if self.render_text:
+            names['text'] = '%s_text' % self.name
+        return names
+
+    def contribute_to_class(self, cls, name, *args, **kwargs):
+        super(RenderedBBCodeMixin, self).contribute_to_class(cls, name, *args, **kwargs)
+        if not cls._meta.abstract:
+            models.signals.post_save.connect(self.save_companions, sender=cls)
+        setattr(cls, 'get_%s_html' % name, _get_rendered_method(self, as_text=False))
+        setattr(cls, 'get_%s_text' % name, _get_rendered_method(self, as_text=True))
+
+    def add_companions(self, cls):
+        """
+        Add the companion fields the model does not declare. Called once all
+        fields of the model are known, so the companions written out in
+        migrations are not added twice.
+        """
+        existing = set(field.name for field in cls._meta.fields)
+        companions = self.get_companion_names()
+        for offset, key in enumerate(('html', 'text', 'fingerprint')):
+            if key not in companions or companions[key] in existing:
+                continue
+            if key == 'fingerprint':
+                field = models.CharField(max_length=40, editable=False, blank=True, null=True)
+            else:
+                field = models.TextField(editable=False, blank=True, null=True)
+            # companions are saved after the content is rendered
+            field.creation_counter = self.creation_counter + (offset + 1) / 10.0
+            cls.add_to_class(companions[key], field)
+
+    def save_companions(self, instance, raw=False, using=None, update_fields=None, **kwargs):
+        """
+        Write the companions rendered by pre_save when the content was saved
+        with an 'update_fields' leaving them out.
+        """
+        if raw or update_fields is None or self.name not in update_fields:
+            return
+        names = [name for name in self.get_companion_names().values() if name not in update_fields]
+        if names:
+            queryset = instance.__class__._base_manager.using(using)
+            queryset.filter(pk=instance.pk).update(**dict((name, getattr(instance, name)) for name in names))
+
+    def render(self, content):
+        """
+        Render the content to html (and text), returns a dictionary of the
+        companion column values. Both outputs are rendered from the same tree,
+        by bbcode.render_fragments like bbcode.iter_render does.
+        """
+        companions = self.get_companion_names()
+        values = dict((name, None) for name in companions.values())
+        if content is None:
+            return values
+        bbmodule.autodiscover()
+        namespaces = self.namespaces
+        if namespaces is None:
+            namespaces = bbmodule.get_default_namespaces()
+        content = content.replace('\r','')
+        outputs = [('html', False)]
+        if self.render_text:
+            outputs.append(('text', True))
+        parse_context = bbmodule.ParseContext(content)
+        try:
+            head = bbmodule.lib.get_parse_tree(content, namespaces, None, parse_context)
+        except bbmodule.BudgetExceeded:
+            head = None
+            content = escape(content)
+        except bbmodule.ParserError:
+            head = None
+        if head is not None and not head.cacheable:
+            return values
+        for key, as_text in outputs:
+            values[companions[key]] = ''.join(bbmodule.render_fragments(parse_context, head, content, as_text))
+        # truncated by the time budget, render it again when read
+        if head is not None and not head.cacheable:
+            return dict((name, None) for name in companions.values())
+        values[companions['fingerprint']] = bbmodule.lib.get_fingerprint()
+        return values
+
+    def pre_save(self, model_instance, add):
+        content = super(RenderedBBCodeMixin, self).pre_save(model_instance, add)
+        for name, value in self.render(content).items():
+            setattr(model_instance, name, value)
+        return content
+
+
+def add_companion_fields(sender, **kwargs):
+    for field in list(sender._meta.local_fields):
+        if isinstance(field, RenderedBBCodeMixin):
+            field.add_companions(sender)
+
+models.signals.class_prepared.connect(add_companion_fields)
+
+
+def _get_rendered(instance, field, as_text=False):
+    companions = field.get_companion_names()
+    rendered = None
+    if not as_text or field.render_text:
+        bbmodule.autodiscover()
+        if getattr(instance, companions['fingerprint']) == bbmodule.lib.get_fingerprint():
+            rendered = getattr(instance, companions['text' if as_text else 'html'])
+    if rendered is None:
+        content = getattr(instance, field.attname)
+        if content is None:
+            return None
+        rendered = ''.join(bbmodule.iter_render(content, field.namespaces, False, True, None, as_text))
+    return mark_safe(rendered)
+
+def _get_rendered_method(field, as_text=False):
+    """
+    The get_<name>_html and get_<name>_text methods of a model.
+    """
+    def get_rendered(instance):
+        return _get_rendered(instance, field, as_text)
+    return get_rendered
+
+
+class RenderedBBCodeTextField(RenderedBBCodeMixin, BBCodeTextField):
+    """
+    BBCodeTextField storing its rendered html (see RenderedBBCodeMixin)
+    """
+    pass
+
+class RenderedBBCodeCharField(RenderedBBCodeMixin, BBCodeCharField):
+    """
+    BBCodeCharField storing its rendered html (see RenderedBBCodeMixin)
+    """
+    pass
     
     
 class BBCodeFormField(forms.CharField):
     """
-    A form field validating BBCode Input (it does NOT parse it)
+    A form field validating BBCode Input (it does NOT parse it). Contents
+    exceeding the parse budget (by default the BBCODE_PARSE_BUDGET setting)
+    are rejected.
     """
+    def __init__(self, *args, **kwargs):
+        self.budget = kwargs.pop('budget', None)
+        super(BBCodeFormField, self).__init__(*args, **kwargs)
+
     def clean(self, content):
         preclean = forms.CharField.clean(self, content)
-        errors = validate(preclean, auto_discover=True)
+        errors = validate(preclean, auto_discover=True, budget=self.budget)
         if errors:
             raise forms.ValidationError('\n'.join(map(lambda x: 'Line: %s: %s' % (x.lineno, x.message), errors)))
         return content
\ No newline at end of file
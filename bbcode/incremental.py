@@ -0,0 +1,202 @@
+"""
+Incremental parsing for live previews.
+
+state = bbcode.incremental.parse(content)
+...
+state = bbcode.incremental.update(state, offset, removed, inserted)
+preview, errors = state.parsed, state.errors
+
+update replaces 'removed' characters at 'offset' of the state's content with
+the 'inserted' text and returns the state of the new content. The tags are
+only looked for again from shortly before the edit until the tokens match
+those of the previous content, and only the top level tags whose source
+changed are rendered again. The result is the same as the one of
+bbcode.parse(content, strict=False).
+
+Offsets are counted in the content without carriage returns (state.content).
+Tokenizing starts again at the line before the edit, at the first '[' not
+closed before it, or at the first tag before it which matches differently
+after the edit. A tag which did not match before the edit and matches from
+further back than that afterwards, across several lines and closing
+brackets, might still be missed.
+"""
+from bbcode.compat import escape
+from bbcode import (lib, get_default_namespaces, iter_convert_linefeeds,
+                    ParseContext, ParserError, BudgetExceeded, OutOfTime, SoftException)
+
+
+class ParseState(object):
+    """
+    A parsed content with its tokens and the rendered fragments of its top
+    level tags.
+    """
+    def __init__(self, content, namespaces, as_text=False, context=None):
+        self.content = content
+        self.namespaces = namespaces
+        self.as_text = as_text
+        self.context = context
+        self.fingerprint = lib.get_fingerprint()
+        # (match, tagklass, opener) tuples in document order
+        self.tokens = []
+        # (tagklass, source) -> (fragments, errors) of the top level tags
+        self.blocks = {}
+        self.parsed = ''
+        self.errors = []
+
+
+def parse(content, namespaces=None, as_text=False, context=None):
+    """
+    Parse a content and return a ParseState to update.
+    """
+    if namespaces is None:
+        namespaces = get_default_namespaces()
+    state = ParseState(content.replace('\r',''), frozenset(namespaces), as_text, context)
+    profile = lib.get_profile(state.namespaces)
+    render(state, list(profile.tokenizer.tokenize(state.content)), {})
+    return state
+
+def update(state, offset, removed, inserted):
+    """
+    Apply an edit to the content of a ParseState, returns the new ParseState.
+    """
+    if offset < 0 or removed < 0 or offset + removed > len(state.content):
+        raise ValueError("The edit (%s, %s) is outside of the content." % (offset, removed))
+    inserted = inserted.replace('\r','')
+    content = state.content[:offset] + inserted + state.content[offset + removed:]
+    if state.fingerprint != lib.get_fingerprint():
+        return parse(content, state.namespaces, state.as_text, state.context)
+    new = ParseState(content, state.namespaces, state.as_text, state.context)
+    profile = lib.get_profile(new.namespaces)
+    restart = get_restart(state, offset)
+    restart = get_changed_token(state.tokens, profile, content, restart)
+    tokens = retokenize(state.tokens, profile, content, restart, offset, removed, len(inserted))
+    render(new, tokens, state.blocks)
+    return new
+
+def get_restart(state, offset):
+    """
+    Where to look for tags again: the start of the line before the edit or
+    the first '[' not closed before it, outside of the previous tokens.
+    """
+    content = state.content
+    restart = content.rfind('\n', 0, max(content.rfind('\n', 0, offset), 0)) + 1
+    bracket = content.find('[', content.rfind(']', 0, offset) + 1, offset)
+    if bracket != -1 and bracket < restart:
+        restart = bracket
+    for match, tagklass, opener in reversed(state.tokens):
+        if match.start() < restart:
+            if match.end() > restart:
+                restart = match.start()
+            break
+    return restart
+
+def get_changed_token(tokens, profile, content, restart):
+    """
+    Match the tokens starting before 'restart' again, a pattern may read past
+    the end of its match up to the edit. Returns the start of the first one
+    matching differently, or 'restart'.
+    """
+    for match, tagklass, opener in tokens:
+        start = match.start()
+        if start >= restart:
+            break
+        patterns = profile.open_patterns if opener else profile.close_patterns
+        rematch = patterns[tagklass].match(content, start)
+        if rematch is None or rematch.end() != match.end():
+            return start
+    return restart
+
+def retokenize(tokens, profile, content, restart, offset, removed, inserted):
+    """
+    Get the tokens of the edited content from the tokens before the edit,
+    the tokens found from 'restart' on and, once the tokenizer finds a
+    token of the previous content again, the shifted remaining tokens.
+    """
+    delta = inserted - removed
+    keep = 0
+    while keep < len(tokens) and tokens[keep][0].start() < restart:
+        keep += 1
+    result = tokens[:keep]
+    index = keep
+    end = offset + inserted
+    for token in profile.tokenizer.tokenize(content, restart):
+        match, tagklass, opener = token
+        start = match.start()
+        # the character before a tag may be part of its pattern
+        if start > end:
+            while index < len(tokens) and tokens[index][0].start() + delta < start:
+                index += 1
+            if index < len(tokens):
+                previous, previous_klass, previous_opener = tokens[index]
+                if (previous.start() + delta == start and previous.end() + delta == match.end()
+                    and previous_klass is tagklass and previous_opener == opener):
+                    result.append(token)
+                    result.extend(shift(profile, content, tokens[index + 1:], delta))
+                    return result
+        result.append(token)
+    return result
+
+def shift(profile, content, tokens, delta):
+    """
+    Match the tokens of the previous content again at their new offsets.
+    """
+    if not delta:
+        return tokens
+    shifted = []
+    for match, tagklass, opener in tokens:
+        patterns = profile.open_patterns if opener else profile.close_patterns
+        shifted.append((patterns[tagklass].match(content, match.start() + delta), tagklass, opener))
+    return shifted
+
+def is_cacheable(node):
+    return node.cacheable and all(is_cacheable(child) for child in node.nodes)
+
+def get_source(content, node):
+    if node.end is not None:
+        return content[node.start:node.end]
+    # unclosed tags run until the end of the content
+    return content[node.start:]
+
+def render(state, tokens, blocks):
+    """
+    Build the tree of the state's content from its tokens and render it,
+    reusing the fragments and errors of unchanged top level tags in 'blocks'.
+    """
+    content = state.content
+    profile = lib.get_profile(state.namespaces)
+    parse_context = ParseContext(content, state.context)
+    state.tokens = tokens
+    try:
+        head = lib.build_parse_tree(content, tokens, state.context, profile.uncacheable, parse_context)
+    except BudgetExceeded:
+        fragments = [escape(content)]
+    except ParserError:
+        fragments = [content]
+    else:
+        fragments = []
+        for node in head.nodes:
+            if parse_context.out_of_time():
+                parse_context.truncate(node)
+                break
+            key = None
+            if not node.is_text_node and is_cacheable(node):
+                key = (node.__class__, get_source(content, node))
+            block = blocks.get(key) if key else None
+            if block is None:
+                raised = len(parse_context.exceptions)
+                try:
+                    with parse_context.activated():
+                        block = (list(node.iter_parse(as_text=state.as_text)), parse_context.exceptions[raised:])
+                except OutOfTime:
+                    parse_context.truncate(node)
+                    break
+            else:
+                # errors raised while rendering are reported at the same position
+                lineno, column = parse_context.get_position()
+                for error in block[1]:
+                    parse_context.exceptions.append(SoftException(lineno, error.message, column, error.code))
+            if key:
+                state.blocks[key] = block
+            fragments.extend(block[0])
+    state.parsed = ''.join(iter_convert_linefeeds(fragments, state.as_text))
+    state.errors = parse_context.pull()
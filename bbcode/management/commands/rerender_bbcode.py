@@ -0,0 +1,149 @@
+import json
+import os
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction
+bbmodule = __import__('bbcode',level=0)
+from bbcode.fields import RenderedBBCodeMixin
+
+
+def get_rendered_fields(labels=None):
+    """
+    Get the (model, field) pairs of all rendered BBCode fields, optionally
+    restricted to 'app_label.ModelName' labels.
+    """
+    from django.apps import apps
+    if labels:
+        try:
+            models = [apps.get_model(label) for label in labels]
+        except (LookupError, ValueError) as e:
+            raise CommandError(str(e))
+    else:
+        models = apps.get_models()
+    pairs = []
+    for model in models:
+        for field in model._meta.local_fields:
+            if isinstance(field, RenderedBBCodeMixin):
+                pairs.append((model, field))
+    return pairs
+
+def get_field_label(model, field):
+    return '%s.%s.%s' % (model._meta.app_label, model._meta.object_name, field.name)
+
+def render_rows(rows, label):
+    """
+    Render (pk, content) rows of a field, returns (pk, companion values)
+    tuples. Runs in the worker processes.
+    """
+    from django.apps import apps
+    app_label, model_name, field_name = label.split('.')
+    field = apps.get_model(app_label, model_name)._meta.get_field(field_name)
+    return [(pk, field.render(content)) for pk, content in rows]
+
+
+class Command(BaseCommand):
+    help = ("Renders the content of all rendered BBCode fields again and stores "
+            "the result, eg after changing a tag.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('models', nargs='*', metavar='app_label.ModelName',
+            help='Only re-render these models.')
+        parser.add_argument('--batch-size', type=int, default=1000,
+            help='Rows loaded and written at once (default: 1000).')
+        parser.add_argument('--workers', type=int, default=1,
+            help='Render in a pool of that many processes (default: 1).')
+        parser.add_argument('--chunksize', type=int, default=100,
+            help='Rows sent to a worker process at once (default: 100).')
+        parser.add_argument('--checkpoint',
+            help='Store the progress in this file and resume from it, remove '
+                 'the file to start over.')
+        parser.add_argument('--stale', action='store_true',
+            help='Only re-render rows rendered with other tags than the current ones.')
+
+    def handle(self, *args, **options):
+        bbmodule.autodiscover()
+        self.verbosity = options.get('verbosity', 1)
+        self.checkpoint = options.get('checkpoint')
+        self.progress = self.load_checkpoint()
+        pairs = get_rendered_fields(options.get('models'))
+        if not pairs:
+            raise CommandError("No rendered BBCode fields found.")
+        executor = None
+        if options['workers'] > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            executor = ProcessPoolExecutor(options['workers'])
+        try:
+            for model, field in pairs:
+                self.rerender(model, field, executor, options['batch_size'],
+                              options['chunksize'], options['stale'])
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    def load_checkpoint(self):
+        if not self.checkpoint or not os.path.exists(self.checkpoint):
+            return {}
+        with open(self.checkpoint) as f:
+            return json.load(f)
+
+    def save_checkpoint(self):
+        if not self.checkpoint:
+            return
+        # write and rename, so an interrupted run keeps the last checkpoint.
+        # Primary keys like UUIDs are stored as strings, filters take those.
+        with open(self.checkpoint + '.tmp', 'w') as f:
+            json.dump(self.progress, f, cls=DjangoJSONEncoder)
+        os.rename(self.checkpoint + '.tmp', self.checkpoint)
+
+    def rerender(self, model, field, executor, batch_size, chunksize, stale):
+        label = get_field_label(model, field)
+        names = field.get_companion_names()
+        queryset = model._default_manager.exclude(**{field.attname: None})
+        if stale:
+            fingerprint = bbmodule.lib.get_fingerprint()
+            queryset = queryset.exclude(**{names['fingerprint']: fingerprint})
+        last = self.progress.get(label)
+        if last is not None:
+            total = queryset.filter(pk__gt=last).count()
+        else:
+            total = queryset.count()
+        done = 0
+        started = time.time()
+        if self.verbosity:
+            self.stdout.write('%s: %d rows to render' % (label, total))
+        while True:
+            # keyset pagination, only one batch is loaded at a time
+            page = queryset if last is None else queryset.filter(pk__gt=last)
+            rows = list(page.order_by('pk').values_list('pk', field.attname)[:batch_size])
+            if not rows:
+                break
+            if executor is not None:
+                # the pool forks its workers when the chunks are submitted,
+                # they must not share the connections opened by the queries
+                connections.close_all()
+            results = bbmodule.map_chunks(render_rows, rows, (label,), executor, None, chunksize)
+            self.write(model, results, names.values())
+            last = rows[-1][0]
+            self.progress[label] = last
+            self.save_checkpoint()
+            done += len(rows)
+            if self.verbosity:
+                elapsed = time.time() - started
+                self.stdout.write('%s: %d/%d rows (%.0f rows/s)' % (
+                    label, done, total, done / elapsed if elapsed else 0))
+
+    def write(self, model, results, names):
+        manager = model._default_manager
+        if hasattr(manager, 'bulk_update'):
+            instances = []
+            for pk, values in results:
+                instance = model(pk=pk)
+                for name, value in values.items():
+                    setattr(instance, name, value)
+                instances.append(instance)
+            manager.bulk_update(instances, list(names))
+        else:
+            with transaction.atomic(using=manager.db):
+                for pk, values in results:
+                    manager.filter(pk=pk).update(**values)
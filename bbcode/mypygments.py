@@ -1,14 +1,159 @@
+import re
+import time
+import hashlib
 from pygments.formatters import HtmlFormatter
+from pygments.lexers import get_lexer_by_name, get_all_lexers, find_lexer_class, TextLexer
+from pygments.modeline import get_filetype_from_buffer
+from pygments.util import ClassNotFound
+from bbcode.cache import LRUCache, MISSING
+from bbcode.compat import force_bytes
 
 
 class CodeHtmlFormatter(HtmlFormatter):
-    def wrap(self, source, outfile):
+    def wrap(self, source, outfile=None):
+        # pygments 2.12 dropped the outfile argument
         return self._wrap_code(source)
 
+    def _wrap_div(self, source):
+        # pygments 2.12 wraps the div itself, ours is written by _wrap_code
+        return source
+
     def _wrap_code(self, source):
         yield 0, '<div class="highlight"><pre>'
         for i, t in source:
             if i == 1:
                 t = '<div class="code-line">%s</div>' % t
             yield i, t
-        yield 0, '</pre></div>'
\ No newline at end of file
+        yield 0, '</pre></div>'
+
+
+# Cheap checks tried before asking every pygments lexer, in order
+HEURISTICS = [
+    (re.compile(r'\A#!.*\bpython'), 'python'),
+    (re.compile(r'\A#!.*\b(ba|z|k)?sh\b'), 'bash'),
+    (re.compile(r'\A#!.*\bnode\b'), 'javascript'),
+    (re.compile(r'\A#!.*\bruby\b'), 'ruby'),
+    (re.compile(r'\A#!.*\bperl\b'), 'perl'),
+    (re.compile(r'<\?php'), 'php'),
+    (re.compile(r'\A\s*<\?xml\b'), 'xml'),
+    (re.compile(r'\A\s*<(!DOCTYPE html|html\b)', re.I), 'html'),
+    (re.compile(r'^\s*#include\s*[<"]', re.M), 'cpp'),
+    (re.compile(r'^\s*(def \w+\(.*\):|class \w+(\(.*\))?:|from [\w.]+ import )', re.M), 'python'),
+    (re.compile(r'^\s*(SELECT .* FROM|INSERT INTO|UPDATE \w+ SET|CREATE TABLE)\b', re.M | re.I), 'sql'),
+]
+
+GUESS_DEFAULTS = {
+    'SIZE': 4096,   # characters of the code looked at
+    'TIME': 0.05,   # seconds spent asking the pygments lexers
+}
+
+# keyed by the names used in [code=...], misses included
+LEXERS = LRUCache(256)
+GUESSES = LRUCache(256)
+SETTINGS = {}
+
+def get_setting(name, default):
+    """
+    Get a setting, read once.
+    """
+    if name not in SETTINGS:
+        value = default
+        try:
+            from django.conf import settings
+            from django.core.exceptions import ImproperlyConfigured
+        except ImportError:
+            pass
+        else:
+            try:
+                value = getattr(settings, name, default)
+            except ImproperlyConfigured:
+                pass
+        SETTINGS[name] = value
+    return SETTINGS[name]
+
+def reset_settings(setting=None, **kwargs):
+    """
+    Forget the settings and memoized lexers when a setting is overridden.
+    """
+    if setting in ('BBCODE_LEXER_ALIASES', 'BBCODE_LEXER_GUESS'):
+        SETTINGS.clear()
+        LEXERS.clear()
+        GUESSES.clear()
+
+try:
+    from django.core.signals import setting_changed
+except ImportError:
+    pass
+else:
+    setting_changed.connect(reset_settings)
+
+def get_lexer_by_alias(name):
+    """
+    Get a lexer by its name, also accepting the names of the
+    BBCODE_LEXER_ALIASES setting (eg {'js': 'javascript'}). Returns None if
+    there is no such lexer. The last lookups are memoized.
+    """
+    name = name.strip().lower()
+    lexer = LEXERS.get(name, MISSING)
+    if lexer is MISSING:
+        aliases = get_setting('BBCODE_LEXER_ALIASES', {})
+        try:
+            lexer = get_lexer_by_name(aliases.get(name, name))
+        except ClassNotFound:
+            lexer = None
+        LEXERS.set(name, lexer)
+    return lexer
+
+def guess_lexer(code):
+    """
+    Guess the lexer of a code. Only looks at the first characters of the code
+    and tries cheap heuristics before asking every pygments lexer, which it
+    stops doing when the time budget is spent. Falls back to TextLexer.
+    The BBCODE_LEXER_GUESS setting overrides the SIZE and TIME budgets.
+    Guesses cut short by the time budget are not memoized.
+    """
+    budget = dict(GUESS_DEFAULTS, **get_setting('BBCODE_LEXER_GUESS', {}))
+    sample = code[:budget['SIZE']]
+    key = hashlib.sha1(force_bytes(sample)).hexdigest()
+    lexer = GUESSES.get(key)
+    if lexer is None:
+        lexer = guess_sample(sample, budget['TIME'])
+        if lexer is None:
+            return TextLexer()
+        GUESSES.set(key, lexer)
+    return lexer
+
+def iter_lexer_classes():
+    """
+    Yields the pygments lexer classes by name, importing them one at a time.
+    """
+    for name, aliases, filenames, mimetypes in sorted(get_all_lexers()):
+        klass = find_lexer_class(name)
+        if klass is not None:
+            yield klass
+
+def guess_sample(sample, timeout):
+    """
+    Guess the lexer of a sample, TextLexer if no lexer recognizes it or None
+    if the lexers could not all be asked within 'timeout' seconds.
+    """
+    # vim modelines are explicit
+    name = get_filetype_from_buffer(sample)
+    if name and get_lexer_by_alias(name):
+        return get_lexer_by_alias(name)
+    for pattern, name in HEURISTICS:
+        if pattern.search(sample):
+            return get_lexer_by_alias(name)
+    deadline = time.time() + timeout
+    best, best_klass = 0.0, None
+    for klass in iter_lexer_classes():
+        score = klass.analyse_text(sample)
+        if score == 1.0:
+            return klass()
+        if score > best:
+            best, best_klass = score, klass
+        if time.time() > deadline:
+            return None
+    if best_klass is None:
+        return TextLexer()
+    return best_klass()
@@ -0,0 +1,112 @@
+"""
+Profiling of the BBCode parser.
+
+Parses running in this thread inside a profile block record the time spent
+and the characters processed in each phase (tokenize, build, render,
+linefeeds) and the calls, time and output of each tag class:
+
+with bbcode.profiler.profile() as stats:
+    parsed, errors = bbcode.parse(content)
+print(stats.report())
+
+stats.as_dict() returns the same numbers. The time of a tag includes the tags
+nested in it, 'own' excludes them. Outside of a profile block the parser only
+looks up the active profile once per parse.
+"""
+import threading
+from contextlib import contextmanager
+from timeit import default_timer as timer
+
+PHASES = ('tokenize', 'build', 'render', 'linefeeds')
+
+LOCAL = threading.local()
+
+
+def get_active_profile():
+    """
+    Get the Profile recording the parses of this thread, or None.
+    """
+    return getattr(LOCAL, 'profile', None)
+
+@contextmanager
+def profile(stats=None):
+    """
+    Record the parses of this thread in a Profile (a new one unless given)
+    until the block is left.
+    """
+    if stats is None:
+        stats = Profile()
+    previous = get_active_profile()
+    LOCAL.profile = stats
+    try:
+        yield stats
+    finally:
+        LOCAL.profile = previous
+
+
+class Profile(object):
+    def __init__(self):
+        self.phases = {}
+        self.tags = {}
+        # time spent in the nested tags of each tag being rendered
+        self.nested = []
+
+    def add_phase(self, name, started, size=0):
+        """
+        Record a phase which started at 'started' (a timer value) and
+        processed 'size' characters.
+        """
+        elapsed = timer() - started
+        stats = self.phases.get(name)
+        if stats is None:
+            stats = self.phases[name] = {'calls': 0, 'time': 0.0, 'bytes': 0}
+        stats['calls'] += 1
+        stats['time'] += elapsed
+        stats['bytes'] += size
+
+    def render_node(self, node, render, as_text=False):
+        """
+        Call render(as_text) for a node, record it and return its output.
+        """
+        self.nested.append(0.0)
+        started = timer()
+        try:
+            output = render(as_text)
+        finally:
+            elapsed = timer() - started
+            nested = self.nested.pop()
+            if self.nested:
+                self.nested[-1] += elapsed
+        stats = self.tags.get(node.__class__)
+        if stats is None:
+            stats = self.tags[node.__class__] = {'calls': 0, 'time': 0.0, 'own': 0.0, 'bytes': 0}
+        stats['calls'] += 1
+        stats['time'] += elapsed
+        stats['own'] += elapsed - nested
+        stats['bytes'] += len(output or '')
+        return output
+
+    def as_dict(self):
+        """
+        Returns {'phases': {name: stats}, 'tags': {class path: stats}}, times
+        are in seconds.
+        """
+        from bbcode import get_class_path
+        return {
+            'phases': dict((name, dict(stats)) for name, stats in self.phases.items()),
+            'tags': dict((get_class_path(klass), dict(stats)) for klass, stats in self.tags.items()),
+        }
+
+    def report(self):
+        """
+        Returns the statistics as a table, the slowest tags first.
+        """
+        data = self.as_dict()
+        lines = ['%-40s %8s %10s %10s %10s' % ('phase / tag', 'calls', 'ms', 'own ms', 'bytes')]
+        for name in PHASES:
+            if name in data['phases']:
+                stats = data['phases'][name]
+                lines.append('%-40s %8d %10.3f %10s %10d' % (name, stats['calls'], stats['time'] * 1000, '', stats['bytes']))
+        for path, stats in sorted(data['tags'].items(), key=lambda item: -item[1]['own']):
+            lines.append('%-40s %8d %10.3f %10.3f %10d' % (path, stats['calls'], stats['time'] * 1000, stats['own'] * 1000, stats['bytes']))
+        return '\n'.join(lines)
@@ -0,0 +1,128 @@
+"""
+Compact serialization of BBCode parse trees.
+
+A serialized tree only stores the tags found by the tokenizer, as a flat list
+of integers: for each tag '(class index << 1) | opener' followed by its start
+offset. Loading it matches each tag's own pattern at the stored offset and
+rebuilds the tree without tokenizing, so contents can be parsed once when
+they are written and rendered many times when they are read:
+
+data = bbcode.serializer.dumps(content)
+...
+parsed, errors = bbcode.serializer.render(data, content)
+
+The source is not part of the data, store it next to it. Serialized trees
+become stale when the registered tags change (or the content does not match),
+loading them then raises a SerializationError and the content has to be
+parsed again.
+"""
+import json
+import hashlib
+from bbcode.compat import escape, force_bytes, string_types
+from bbcode import (lib, render_fragments, get_default_namespaces,
+                    get_class_path, ParseContext, ParserError, BudgetExceeded)
+
+FORMAT_VERSION = 1
+
+
+class SerializationError(Exception): pass
+
+
+def get_digest(content):
+    return hashlib.sha1(force_bytes(content)).hexdigest()
+
+def serialize(content, namespaces=None):
+    """
+    Get the serialized parse tree of a content as a dictionary.
+    """
+    if namespaces is None:
+        namespaces = get_default_namespaces()
+    content = content.replace('\r','')
+    profile = lib.get_profile(namespaces)
+    classes = {}
+    tokens = []
+    for match, tagklass, opener in profile.tokenizer.tokenize(content):
+        index = classes.setdefault(tagklass, len(classes))
+        tokens.append(index << 1 | opener)
+        tokens.append(match.start())
+    return {
+        'version': FORMAT_VERSION,
+        'fingerprint': lib.get_fingerprint(),
+        'digest': get_digest(content),
+        'classes': [get_class_path(klass) for klass in sorted(classes, key=classes.get)],
+        'tokens': tokens,
+    }
+
+def dumps(content, namespaces=None):
+    """
+    Get the serialized parse tree of a content as a JSON string.
+    """
+    return json.dumps(serialize(content, namespaces), separators=(',', ':'))
+
+def get_tokens(data, content):
+    """
+    Yields the (match, tagklass, opener) tuples stored in a serialized tree.
+    """
+    registered = {}
+    for tags in lib.tags.values():
+        for klass in tags:
+            registered[get_class_path(klass)] = klass
+    try:
+        classes = [registered[path] for path in data['classes']]
+    except KeyError as e:
+        raise SerializationError("Tag class %s is not registered." % e)
+    patterns = {}
+    tokens = data['tokens']
+    for index in range(0, len(tokens), 2):
+        code, start = tokens[index], tokens[index + 1]
+        tagklass = classes[code >> 1]
+        opener = bool(code & 1)
+        pattern = patterns.get((tagklass, opener))
+        if pattern is None:
+            pattern = tagklass.open_pattern if opener else tagklass.close_pattern
+            if callable(pattern):
+                pattern = pattern()
+            patterns[(tagklass, opener)] = pattern
+        match = pattern.match(content, start)
+        if not match:
+            raise SerializationError("Tag %s does not match at offset %s." % (data['classes'][code >> 1], start))
+        yield match, tagklass, opener
+
+def deserialize(data, content, context=None, parse_context=None):
+    """
+    Rebuild the parse tree of a content from its serialized tree, which may be
+    a dictionary or a JSON string. Returns a HeadNode instance.
+    """
+    if isinstance(data, string_types):
+        data = json.loads(data)
+    content = content.replace('\r','')
+    if data.get('version') != FORMAT_VERSION:
+        raise SerializationError("Unsupported serialization format %r." % data.get('version'))
+    if data['fingerprint'] != lib.get_fingerprint():
+        raise SerializationError("The registered tags changed since serialization.")
+    if data['digest'] != get_digest(content):
+        raise SerializationError("The content changed since serialization.")
+    tokens = list(get_tokens(data, content))
+    uncacheable = frozenset(tagklass for match, tagklass, opener in tokens if not tagklass.cacheable)
+    return lib.build_parse_tree(content, tokens, context, uncacheable, parse_context)
+
+def render(data, content, strict=True, context=None, as_text=False):
+    """
+    Render a content from its serialized tree. Works like bbcode.parse and
+    returns a (parsed, errors) tuple, a content exceeding the parse budget is
+    escaped.
+    """
+    content = content.replace('\r','')
+    parse_context = ParseContext(content, context)
+    try:
+        head = deserialize(data, content, context, parse_context)
+    except BudgetExceeded:
+        head = None
+        content = escape(content)
+    except ParserError:
+        if strict:
+            raise
+        head = None
+    errors = []
+    parsed = ''.join(render_fragments(parse_context, head, content, as_text, errors))
+    return parsed, errors
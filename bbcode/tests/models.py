@@ -0,0 +1,6 @@
+from django.db import models
+from bbcode.fields import RenderedBBCodeTextField
+
+
+class Post(models.Model):
+    body = RenderedBBCodeTextField(render_text=True)
@@ -0,0 +1,53 @@
+import sys
+import unittest
+from django.test import SimpleTestCase
+import bbcode
+
+if sys.version_info >= (3, 7):
+    import asyncio
+
+QUOTE = {
+    'author': {'avatar': '', 'rank': 3, 'first_name': 'Ada', 'last_name': 'Lovelace',
+               'url': '/ada/', 'specialty': 'maths'},
+    'content': {'url': '/notes/', 'title': 'Notes'},
+}
+
+
+@unittest.skipIf(sys.version_info < (3, 7), 'bbcode.aio needs python 3.7')
+class AsyncParseTests(SimpleTestCase):
+    def setUp(self):
+        bbcode.autodiscover()
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+        # the async quote resolver is registered when the tags are loaded
+        resolve_quotes = bbcode.lib.get_async_resolver('quote')
+        self.addCleanup(bbcode.lib.register_async_resolver, 'quote', resolve_quotes)
+        self.looked_up = []
+
+    def aparse(self, content, **kwargs):
+        return self.loop.run_until_complete(bbcode.aparse(content, cache=False, **kwargs))
+
+    def resolve_quotes(self, content_ids):
+        # returns an awaitable like a coroutine function would
+        self.looked_up.append(sorted(content_ids))
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(dict((content_id, QUOTE) for content_id in content_ids))
+        return future
+
+    def test_same_as_parse(self):
+        content = '[b]bold[/b] http://example.com [code=python]x = 1[/code] [i]open'
+        self.assertEqual(self.aparse(content, strict=False)[0],
+                         bbcode.parse(content, strict=False, cache=False)[0])
+
+    def test_async_resolver(self):
+        bbcode.register_async_resolver('quote', self.resolve_quotes)
+        parsed, errors = self.aparse('[quote=1]a[/quote][quote=2]b[/quote]')
+        self.assertEqual(self.looked_up, [['1', '2']])
+        self.assertEqual(parsed.count('Ada Lovelace'), 2)
+        self.assertEqual(errors, [])
+
+    def test_resolver_in_executor(self):
+        bbcode.register_async_resolver('quote', None)
+        content = '[quote=1]a[/quote]'
+        self.assertEqual(self.aparse(content)[0], bbcode.parse(content, cache=False)[0])
+        self.assertEqual(self.looked_up, [])
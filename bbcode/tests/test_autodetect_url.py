@@ -0,0 +1,57 @@
+import time
+from django.test import SimpleTestCase
+import bbcode
+from bbcode.bbtags.relational import AutoDetectURL
+
+# seconds an adversarial document may take, they render in well under 0.2s
+TIME_LIMIT = 2.0
+
+
+class AutoDetectURLTests(SimpleTestCase):
+    def setUp(self):
+        bbcode.autodiscover()
+
+    def match(self, content):
+        match = AutoDetectURL.open_pattern.search(content)
+        return match.group() if match else None
+
+    def test_matches(self):
+        self.assertEqual(self.match('see http://example.com/path?x=1 now'), 'http://example.com/path?x=1')
+        self.assertEqual(self.match('https://a.b-c.d:8080/x_y,z.html'), 'https://a.b-c.d:8080/x_y,z.html')
+        self.assertEqual(self.match('ftp://files.example.org/'), 'ftp://files.example.org/')
+        self.assertEqual(self.match('ftps://host!'), 'ftps://host')
+        self.assertEqual(self.match('http://host:port'), 'http://host')
+        self.assertIsNone(self.match('http:// host'))
+        self.assertIsNone(self.match('gopher://host'))
+
+    def test_render(self):
+        parsed, errors = bbcode.parse('go to http://example.com/a?b=c.', cache=False)
+        self.assertEqual(parsed, 'go to <a href="http://example.com/a?b=c.">http://example.com/a?b=c.</a>')
+        parsed, errors = bbcode.parse('go to http://example.com', cache=False, as_text=True)
+        self.assertEqual(parsed, 'go to http://example.com')
+
+    def test_invalid_url(self):
+        parsed, errors = bbcode.parse('[url]http://example[/ul[/url]', strict=False, cache=False)
+        self.assertEqual(parsed, '[url]http://example[/ul[/url]')
+        self.assertEqual([error.message for error in errors], ["'http://example[/ul' is not a valid url"])
+
+    def assertFast(self, content):
+        started = time.time()
+        bbcode.parse(content, strict=False, cache=False)
+        elapsed = time.time() - started
+        self.assertTrue(elapsed < TIME_LIMIT, '%d characters took %.2fs' % (len(content), elapsed))
+
+    def test_long_host(self):
+        self.assertFast('http://' + 'a' * 100000 + '!')
+
+    def test_dots_and_dashes(self):
+        self.assertFast('http://' + '.-' * 50000 + ' ')
+
+    def test_repeated_schemes(self):
+        self.assertFast('http://a' * 5000)
+        self.assertFast('http://' * 5000)
+        self.assertFast('[url]' + 'http://a' * 2000 + '[/url]')
+
+    def test_long_query(self):
+        self.assertFast('http://a/?' + 'x' * 100000)
+        self.assertFast('http://a/' + '/.,-' * 25000 + '?')
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+from django.test import SimpleTestCase
+import bbcode
+
+
+class FakeTime(object):
+    """
+    Stands in for the time module of bbcode, each call moves the clock on by
+    'step' seconds.
+    """
+    def __init__(self):
+        self.now = 1000.0
+        self.step = 0.0
+
+    def time(self):
+        self.now += self.step
+        return self.now
+
+
+class BudgetTests(SimpleTestCase):
+    def setUp(self):
+        bbcode.autodiscover()
+
+    def parse(self, content, **budget):
+        return bbcode.parse(content, strict=False, budget=budget)
+
+    def assertOverBudget(self, errors, message):
+        self.assertEqual([(error.code, error.message) for error in errors if error.code == 'budget'],
+                         [('budget', message)])
+
+    def test_within_budget(self):
+        parsed, errors = self.parse('[b]x[/b]', bytes=8, tags=2, depth=1, ms=10000)
+        self.assertEqual(parsed, '<strong>x</strong>')
+        self.assertEqual(errors, [])
+
+    def test_bytes(self):
+        parsed, errors = self.parse(u'[b]\xe9\xe9[/b]', bytes=9)
+        self.assertEqual(parsed, u'[b]\xe9\xe9[/b]')
+        self.assertOverBudget(errors, 'The content is too long (11 bytes, at most 9 are allowed).')
+        parsed, errors = self.parse(u'[b]\xe9\xe9[/b]', bytes=11)
+        self.assertEqual(parsed, u'<strong>\xe9\xe9</strong>')
+
+    def test_tags(self):
+        parsed, errors = self.parse('[b]x[/b]<[i]y[/i]', tags=3)
+        self.assertEqual(parsed, '[b]x[/b]&lt;[i]y[/i]')
+        self.assertOverBudget(errors, 'The content has too many tags (at most 3 are allowed).')
+
+    def test_depth(self):
+        parsed, errors = self.parse('[b][i][u]x[/u][/i][/b]', depth=2)
+        self.assertEqual(parsed, '[b][i][u]x[/u][/i][/b]')
+        self.assertOverBudget(errors, 'The tags are nested too deeply (at most 2 levels are allowed).')
+
+    def test_dictionary(self):
+        budget = bbcode.get_budget({'TAGS': 1, 'MS': 5})
+        self.assertEqual((budget.bytes, budget.tags, budget.depth, budget.ms), (None, 1, None, 5))
+        self.assertFalse(bbcode.get_budget(False))
+
+
+class TimeBudgetTests(SimpleTestCase):
+    def setUp(self):
+        bbcode.autodiscover()
+        self.time = FakeTime()
+        self.addCleanup(setattr, bbcode, 'time', bbcode.time)
+        bbcode.time = self.time
+
+    def render(self, content, ms=100):
+        # the clock only runs while rendering
+        parse_context = bbcode.ParseContext(content, budget={'MS': ms})
+        head = bbcode.lib.get_parse_tree(content, parse_context=parse_context)
+        self.time.step = 0.01
+        parsed = head.parse()
+        return parsed, parse_context.pull()
+
+    def test_top_level(self):
+        parsed, errors = self.render('[b]x[/b]' * 50)
+        self.assertTrue(0 < len(parsed) < len('<strong>x</strong>') * 50)
+        self.assertEqual([error.message for error in errors],
+                         ['The content took too long to render and was truncated.'])
+
+    def test_nested(self):
+        # the time runs out inside the only top level tag
+        parsed, errors = self.render('a[center]' + '[b]x[/b]' * 50 + '[/center]')
+        self.assertEqual(parsed, 'a')
+        self.assertEqual([(error.code, error.column) for error in errors], [('budget', 2)])
+
+    def test_validate(self):
+        content = '[center]' + '[b]x[/b]' * 50 + '[/center]'
+        parse_context = bbcode.ParseContext(content, budget={'MS': 100})
+        head = bbcode.lib.get_parse_tree(content, parse_context=parse_context)
+        self.time.step = 0.01
+        head.check()
+        self.assertEqual([error.message for error in parse_context.pull()],
+                         ['The content took too long to validate.'])
+
+    def test_build(self):
+        self.time.step = 0.01
+        parsed, errors = bbcode.parse('[b]x[/b]' * 50, strict=False, budget={'MS': 100})
+        self.assertEqual(parsed, '[b]x[/b]' * 50)
+        self.assertEqual([error.message for error in errors],
+                         ['The content took too long to parse (more than 100 ms).'])
@@ -0,0 +1,122 @@
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+import bbcode
+from bbcode import cache
+from bbcode.tests.test_budget import FakeTime
+
+LOCAL = {'MAXSIZE': 16, 'TIMEOUT': 300}
+SHARED = {'MAXSIZE': 16, 'TIMEOUT': 300, 'BACKEND': 'default'}
+
+
+class ResolverCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.time = FakeTime()
+        self.addCleanup(setattr, cache, 'time', cache.time)
+        cache.time = self.time
+        self.addCleanup(caches['default'].clear)
+
+    def test_timeout(self):
+        resolver_cache = cache.get_cache_from_config(LOCAL, cache.ResolverCache)
+        key = resolver_cache.get_key('quote', 1)
+        resolver_cache.set(key, 'ada')
+        self.time.now += 299
+        self.assertEqual(resolver_cache.get(key), 'ada')
+        self.time.now += 2
+        self.assertEqual(resolver_cache.get(key), None)
+
+    @override_settings(BBCODE_RESOLVER_CACHE=LOCAL)
+    def test_invalidate_resolved(self):
+        resolver_cache = cache.get_resolver_cache()
+        resolver_cache.set(resolver_cache.get_key('quote', 1), 'ada')
+        resolver_cache.set(resolver_cache.get_key('quote', 2), 'grace')
+        bbcode.invalidate_resolved('quote', 1)
+        self.assertEqual(resolver_cache.get(resolver_cache.get_key('quote', 1)), None)
+        self.assertEqual(resolver_cache.get(resolver_cache.get_key('quote', 2)), 'grace')
+
+    @override_settings(BBCODE_RESOLVER_CACHE=SHARED)
+    def test_invalidate_shared(self):
+        # another process, sharing the backend
+        other = cache.get_cache_from_config(SHARED, cache.ResolverCache)
+        key = other.get_key('quote', 1)
+        other.set(key, 'ada')
+        resolver_cache = cache.get_resolver_cache()
+        self.assertEqual(resolver_cache.get(key), 'ada')
+        self.assertEqual(other.get(key), 'ada')
+        bbcode.invalidate_resolved('quote', 1)
+        self.assertEqual(other.get(key), None)
+        self.assertEqual(resolver_cache.get(key), None)
+
+    def test_render_cache_keeps_local_layer(self):
+        # rendered documents never change under their key
+        render_cache = cache.get_cache_from_config(SHARED, cache.RenderCache)
+        render_cache.set('render:x', 'html')
+        caches['default'].clear()
+        self.assertEqual(render_cache.get('render:x'), 'html')
+
+
+class LRUCacheTests(SimpleTestCase):
+    def test_least_recently_used(self):
+        lru = cache.LRUCache(2)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+        self.assertEqual((lru.get('a'), lru.get('b'), lru.get('c')), (1, None, 3))
+        self.assertEqual(lru.stats(), {'hits': 3, 'misses': 1, 'size': 2, 'maxsize': 2})
+
+    def test_layered(self):
+        layered = cache.get_cache_from_config(SHARED, cache.LayeredCache)
+        self.addCleanup(caches['default'].clear)
+        layered.set('a', 1)
+        layered.local.clear()
+        # read back from the backend and kept locally again
+        self.assertEqual(layered.get('a'), 1)
+        caches['default'].clear()
+        self.assertEqual(layered.get('a'), 1)
+        layered.delete('a')
+        self.assertEqual(layered.get('a'), None)
+
+
+class RenderCacheTests(SimpleTestCase):
+    def setUp(self):
+        bbcode.autodiscover()
+        self.cache = cache.RenderCache(16)
+
+    def test_hit(self):
+        first = bbcode.parse('[b]x[/b] [i]open', strict=False, cache=self.cache)
+        second = bbcode.parse('[b]x[/b] [i]open', strict=False, cache=self.cache)
+        self.assertEqual(first[0], second[0])
+        self.assertEqual([error.message for error in first[1]], [error.message for error in second[1]])
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_key(self):
+        bbcode.parse('[b]x[/b]', cache=self.cache)
+        self.assertEqual(bbcode.parse('[b]x[/b]', as_text=True, cache=self.cache)[0], 'x')
+        self.assertEqual(bbcode.parse('[b]x[/b]', namespaces=['alignment'], cache=self.cache)[0],
+                         '[b]x[/b]')
+        self.assertEqual(self.cache.hits, 0)
+
+    def test_strict(self):
+        # unparseable contents are cached but still raise in strict mode
+        self.assertEqual(bbcode.parse('x[/center]', strict=False, cache=self.cache)[0], 'x[/center]')
+        with self.assertRaises(bbcode.ParserError):
+            bbcode.parse('x[/center]', cache=self.cache)
+
+    def test_uncacheable(self):
+        bbcode.parse('[quote=1]a[/quote]', cache=self.cache)
+        self.assertEqual(self.cache.local.stats()['size'], 0)
+
+    def test_budget(self):
+        bbcode.parse('[b]x[/b]', cache=self.cache, budget={'TAGS': 10})
+        self.assertEqual(self.cache.local.stats()['size'], 0)
+
+    @override_settings(BBCODE_RENDER_CACHE={'MAXSIZE': 4})
+    def test_setting(self):
+        render_cache = cache.get_render_cache()
+        self.assertEqual(render_cache.local.maxsize, 4)
+        bbcode.parse('[b]x[/b]')
+        bbcode.parse('[b]x[/b]')
+        self.assertEqual(render_cache.hits, 1)
+
+    def test_disabled(self):
+        self.assertFalse(cache.get_render_cache())
@@ -0,0 +1,27 @@
+from django.test import SimpleTestCase
+import bbcode
+from bbcode.bbtags import emoticons
+
+
+class EmoticonTests(SimpleTestCase):
+    def setUp(self):
+        bbcode.autodiscover()
+        self.addCleanup(setattr, emoticons, 'EMOTICONS', list(emoticons.EMOTICONS))
+        self.addCleanup(setattr, emoticons, 'PATTERN', None)
+        self.addCleanup(bbcode.lib.invalidate)
+
+    def test_longest_code(self):
+        parsed, errors = bbcode.parse(':) 3:-)', cache=False)
+        self.assertEqual(parsed, '<span class="emoticon emoticon-smiling"></span> '
+                                 '<span class="emoticon emoticon-naughty"></span>')
+
+    def test_add_emoticon(self):
+        emoticons.get_pattern()
+        codes = emoticons.CODES
+        emoticons.add_emoticon('wave', 'o/')
+        parsed, errors = bbcode.parse('o/ :)', cache=False)
+        self.assertEqual(parsed, '<span class="emoticon emoticon-wave"></span> '
+                                 '<span class="emoticon emoticon-smiling"></span>')
+        # the table is replaced, not refilled under running renders
+        self.assertNotIn('o/', codes)
+        self.assertEqual(emoticons.CODES['o/'], 'wave')
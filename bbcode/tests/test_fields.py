@@ -0,0 +1,98 @@
+from django.db import connection
+from django.db.migrations.state import ModelState, ProjectState
+from django.test import TestCase, TransactionTestCase, override_settings
+import bbcode
+from bbcode.tests.models import Post
+from bbcode.tests.test_budget import FakeTime
+
+CONTENTS = ['[b]bold[/b]\n\n[i]open', 'a\n \n[center]b[/center]\n', 'x[/center]',
+            '<b>:)</b> http://example.com']
+
+
+class RenderedFieldTests(TestCase):
+    def test_companions(self):
+        names = [field.name for field in Post._meta.fields]
+        self.assertEqual(names, ['id', 'body', 'body_html', 'body_text', 'body_fingerprint'])
+
+    def test_render_on_save(self):
+        post = Post.objects.create(body='[b]bold[/b]')
+        post = Post.objects.get(pk=post.pk)
+        self.assertEqual(post.body_html, '<strong>bold</strong>')
+        self.assertEqual(post.body_text, 'bold')
+        self.assertEqual(post.get_body_html(), '<strong>bold</strong>')
+
+    def test_uncacheable(self):
+        post = Post.objects.create(body='[quote=1]a[/quote]')
+        self.assertEqual((post.body_html, post.body_text, post.body_fingerprint), (None, None, None))
+        self.assertEqual(post.get_body_html(), bbcode.parse(post.body, cache=False)[0])
+
+    def test_update_fields(self):
+        post = Post.objects.create(body='[b]old[/b]')
+        post.body = '[i]new[/i]'
+        post.save(update_fields=['body'])
+        post = Post.objects.get(pk=post.pk)
+        self.assertEqual(post.body_html, '<em>new</em>')
+        self.assertEqual(post.body_text, 'new')
+        self.assertEqual(post.get_body_html(), '<em>new</em>')
+
+    def test_same_as_parse(self):
+        for content in CONTENTS:
+            post = Post.objects.create(body=content)
+            post = Post.objects.get(pk=post.pk)
+            html = bbcode.parse(content, strict=False, cache=False)[0]
+            text = bbcode.parse(content, strict=False, cache=False, as_text=True)[0]
+            self.assertEqual((post.body_html, post.body_text), (html, text), repr(content))
+            post.body_fingerprint = 'stale'
+            self.assertEqual((post.get_body_html(), post.get_body_text()), (html, text), repr(content))
+
+    @override_settings(BBCODE_PARSE_BUDGET={'BYTES': 8})
+    def test_over_budget(self):
+        post = Post.objects.create(body='[b]<bold>[/b]')
+        self.assertEqual(post.body_html, '[b]&lt;bold&gt;[/b]')
+        self.assertEqual(post.body_html, bbcode.parse(post.body, strict=False, cache=False)[0])
+        self.assertEqual(post.body_fingerprint, bbcode.lib.get_fingerprint())
+
+    @override_settings(BBCODE_PARSE_BUDGET={'MS': 100})
+    def test_out_of_time(self):
+        time = FakeTime()
+        self.addCleanup(setattr, bbcode, 'time', bbcode.time)
+        bbcode.time = time
+        # the clock only runs while rendering
+        iter_parse = bbcode.HeadNode.__dict__['iter_parse']
+        def running_iter_parse(head, as_text=False):
+            time.step = 0.01
+            return iter_parse(head, as_text)
+        self.addCleanup(setattr, bbcode.HeadNode, 'iter_parse', iter_parse)
+        bbcode.HeadNode.iter_parse = running_iter_parse
+        post = Post.objects.create(body='[b]x[/b]' * 50)
+        # truncated renders are not stored
+        self.assertEqual((post.body_html, post.body_text, post.body_fingerprint), (None, None, None))
+        bbcode.HeadNode.iter_parse = iter_parse
+        time.step = 0
+        self.assertEqual(post.get_body_html(), '<strong>x</strong>' * 50)
+
+
+class RenderedFieldMigrationTests(TransactionTestCase):
+    available_apps = ['bbcode', 'bbcode.tests']
+
+    def test_migration_state(self):
+        # migrations write the companions out next to the field
+        state = ModelState.from_model(Post)
+        # a list of pairs before django 3.1, a dict since
+        self.assertEqual([name for name, field in getattr(state.fields, 'items', lambda: state.fields)()],
+                         ['id', 'body', 'body_html', 'body_text', 'body_fingerprint'])
+        project = ProjectState()
+        project.add_model(state)
+        model = project.apps.get_model('tests', 'Post')
+        self.assertEqual([field.name for field in model._meta.fields],
+                         ['id', 'body', 'body_html', 'body_text', 'body_fingerprint'])
+        model._meta.db_table = 'tests_migrated_post'
+        with connection.schema_editor() as editor:
+            editor.create_model(model)
+        try:
+            columns = [column.name for column in connection.introspection.get_table_description(
+                connection.cursor(), 'tests_migrated_post')]
+            self.assertEqual(columns, ['id', 'body', 'body_html', 'body_text', 'body_fingerprint'])
+        finally:
+            with connection.schema_editor() as editor:
+                editor.delete_model(model)
@@ -0,0 +1,55 @@
+import random
+from django.test import SimpleTestCase
+import bbcode
+from bbcode import incremental
+
+DOCUMENT = """[h1]Title[/h1]
+Some [b]bold[/b] and [i]italic[/i] text with http://example.com/a?b=c :)
+
+[ul][*] one
+[*] two [u]underlined[/u][/ul]
+[code=python]def f(x):
+    return x[0][/code]
+[url=http://example.com]link[/url] [url css=a]text[/url]
+[b]unclosed [i]mismatched[/b] end"""
+
+SNIPPETS = ['[', ']', '[b]', '[/b]', '[/i]', ' ', '\n', ':)', 'x', '[url=', '[/url]',
+            '[code]', '[/code]', 'http://x.com/a', '?q=1', '[ul][*]a', '[/ul]']
+
+
+class IncrementalTests(SimpleTestCase):
+    def setUp(self):
+        bbcode.autodiscover()
+
+    def assertSameAsParse(self, state, as_text=False):
+        parsed, errors = bbcode.parse(state.content, strict=False, as_text=as_text, cache=False)
+        self.assertEqual(state.parsed, parsed, repr(state.content))
+        self.assertEqual([(error.lineno, error.column, error.message) for error in state.errors],
+                         [(error.lineno, error.column, error.message) for error in errors])
+
+    def test_parse(self):
+        self.assertSameAsParse(incremental.parse(DOCUMENT))
+        self.assertSameAsParse(incremental.parse(DOCUMENT, as_text=True), True)
+
+    def test_edit_changes_earlier_tag(self):
+        # the argument of the [url] tag now matches up to the edit
+        content = "[url css=a]\nb\nc\nd e]x[/url]"
+        state = incremental.parse(content)
+        state = incremental.update(state, content.index(' e]'), 1, '')
+        self.assertEqual(state.content, "[url css=a]\nb\nc\nde]x[/url]")
+        self.assertSameAsParse(state)
+
+    def test_random_edits(self):
+        rng = random.Random(0)
+        for as_text in (False, True):
+            state = incremental.parse(DOCUMENT, as_text=as_text)
+            for i in range(200):
+                offset = rng.randint(0, len(state.content))
+                removed = min(rng.choice((0, 0, 1, 2, 5)), len(state.content) - offset)
+                inserted = rng.choice(SNIPPETS) if rng.random() < 0.8 else ''
+                state = incremental.update(state, offset, removed, inserted)
+                self.assertSameAsParse(state, as_text)
+
+    def test_invalid_edit(self):
+        state = incremental.parse('abc')
+        self.assertRaises(ValueError, incremental.update, state, 2, 5, '')
@@ -0,0 +1,46 @@
+from django.test import SimpleTestCase
+import bbcode
+from bbcode.bbtags.style import Em, Strong
+from bbcode.bbtags.alignment import Center
+
+BUILTIN_TAGS = ['center', 'code', 'danger', 'download', 'em', 'email', 'emoticon',
+                'h1', 'h2', 'h3', 'h4', 'h5', 'img', 'info', 'justify', 'left', 'ol',
+                'p', 'quote', 'right', 'step', 'steps', 'strong', 'u', 'ul', 'url',
+                'warning', 'youtube']
+
+
+class LibraryTests(SimpleTestCase):
+    def setUp(self):
+        bbcode.autodiscover()
+
+    def test_names(self):
+        self.assertEqual(sorted(bbcode.lib.names), BUILTIN_TAGS)
+        for name, info in bbcode.lib.names.items():
+            self.assertEqual(bbcode.get_tag_name(info['class']), name)
+
+    def test_replace_tag_names(self):
+        self.assertFalse(hasattr(bbcode.ReplaceTagNode, 'tagname'))
+        self.assertEqual(bbcode.get_tag_name(Em), 'em')
+        self.assertEqual(bbcode.get_tag_name(Strong), 'strong')
+        self.assertEqual(bbcode.get_tag_name(Center), 'center')
+
+    def test_replace_tag_render(self):
+        parsed, errors = bbcode.parse('[i]a[/i][b]b[/b][u]c[/u]', cache=False)
+        self.assertEqual(parsed, '<em>a</em><strong>b</strong><u>c</u>')
+
+    def test_unmatched_closing_tag(self):
+        with self.assertRaises(bbcode.ParserError) as raised:
+            bbcode.parse('x[/center]', cache=False)
+        self.assertEqual(str(raised.exception),
+                         "Failed to find matching opening tag for closing tag 'center' in line 1.")
+
+    def test_failed_deferred_import(self):
+        library = bbcode.Library()
+        library.defer('bbcode.tests.missing_tags')
+        library.defer('bbcode.bbtags.style')
+        with self.assertRaises(ImportError):
+            library.names
+        self.assertEqual(library.deferred, ['bbcode.tests.missing_tags', 'bbcode.bbtags.style'])
+        library.deferred.remove('bbcode.tests.missing_tags')
+        library.tags
+        self.assertEqual(library.deferred, [])
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+import random
+from django.test import SimpleTestCase
+import bbcode
+from bbcode import convert_linefeeds, iter_convert_linefeeds
+
+# unicode whitespace only counts as whitespace on python 3, like \s does
+CHARACTERS = [u'a', u'\n', u' ', u'\t', u'\r', u'\xa0', u' ', u'\x1c', u'\x85', u'<b>']
+
+
+class LinefeedTests(SimpleTestCase):
+    def setUp(self):
+        bbcode.autodiscover()
+
+    def assertSameAsJoined(self, fragments):
+        for as_text in (False, True):
+            self.assertEqual(''.join(iter_convert_linefeeds(fragments, as_text)),
+                             convert_linefeeds(''.join(fragments), as_text), repr(fragments))
+
+    def test_fragments(self):
+        self.assertSameAsJoined([u'a\n', u' \n', u'b'])
+        self.assertSameAsJoined([u'a\n\xa0', u'\n', u'<strong>x</strong>'])
+        self.assertSameAsJoined([u'a\n \n', u'b\n'])
+        self.assertSameAsJoined([u'a\n', u'', u'\n\n', u'\xa0'])
+
+    def test_random_fragments(self):
+        rng = random.Random(0)
+        for i in range(2000):
+            content = u''.join(rng.choice(CHARACTERS) for index in range(rng.randint(0, 12)))
+            cuts = sorted(rng.randint(0, len(content)) for index in range(rng.randint(0, 4)))
+            self.assertSameAsJoined([content[start:end] for start, end in zip([0] + cuts, cuts + [len(content)])])
+
+    def test_parse(self):
+        # parse converts the rendered tags fragment by fragment
+        for content in (u'a\n\xa0\n[b]x[/b]', u'[b]x[/b]\n \n[i]y[/i]\n', u'a\n \n[center]b[/center]'):
+            for as_text in (False, True):
+                rendered = bbcode.lib.get_parse_tree(content).parse(as_text=as_text)
+                self.assertEqual(bbcode.parse(content, as_text=as_text, cache=False)[0],
+                                 convert_linefeeds(rendered, as_text))
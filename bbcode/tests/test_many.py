@@ -0,0 +1,49 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.test import SimpleTestCase
+import bbcode
+
+CONTENTS = ['[b]x[/b]', '[i]open', 'x[/center]', '[url]http://example.com[/url]\n\n:)',
+            '[code=python]x = 1[/code]', '[youtube][/youtube]', '']
+
+
+def summarize(result):
+    parsed, errors = result
+    return parsed, [(error.lineno, error.column, error.message) for error in errors]
+
+
+class ManyTests(SimpleTestCase):
+    def setUp(self):
+        bbcode.autodiscover()
+
+    def parsed(self, **kwargs):
+        return [summarize(bbcode.parse(content, strict=False, cache=False, **kwargs)) for content in CONTENTS]
+
+    def test_parse_many(self):
+        self.assertEqual([summarize(result) for result in bbcode.parse_many(CONTENTS, strict=False, cache=False, chunksize=3)],
+                         self.parsed())
+        self.assertEqual([summarize(result) for result in bbcode.parse_many(CONTENTS, strict=False, as_text=True, cache=False)],
+                         self.parsed(as_text=True))
+
+    def test_strict(self):
+        with self.assertRaises(bbcode.ParserError):
+            bbcode.parse_many(CONTENTS, cache=False)
+
+    def test_executor(self):
+        with ThreadPoolExecutor(2) as executor:
+            results = bbcode.parse_many(CONTENTS, strict=False, cache=False, executor=executor, chunksize=2)
+        self.assertEqual([summarize(result) for result in results], self.parsed())
+
+    def test_workers(self):
+        results = bbcode.parse_many(CONTENTS, strict=False, cache=False, workers=2, chunksize=2)
+        self.assertEqual([summarize(result) for result in results], self.parsed())
+
+    def test_budget(self):
+        results = bbcode.parse_many(CONTENTS, strict=False, cache=False, budget={'TAGS': 1})
+        self.assertEqual([summarize(result) for result in results], self.parsed(budget={'TAGS': 1}))
+
+    def test_validate_many(self):
+        expected = [[(error.lineno, error.column, error.message) for error in bbcode.validate(content)]
+                    for content in CONTENTS]
+        for kwargs in ({}, {'workers': 2, 'chunksize': 3}):
+            self.assertEqual([[(error.lineno, error.column, error.message) for error in errors]
+                              for errors in bbcode.validate_many(CONTENTS, **kwargs)], expected)
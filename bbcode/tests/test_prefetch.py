@@ -0,0 +1,56 @@
+from django.test import SimpleTestCase, override_settings
+import bbcode
+
+QUOTE = {
+    'author': {'avatar': '', 'rank': 3, 'first_name': 'Ada', 'last_name': 'Lovelace',
+               'url': '/ada/', 'specialty': 'maths'},
+    'content': {'url': '/notes/', 'title': 'Notes'},
+}
+
+
+@override_settings(BBCODE_RESOLVER_CACHE=None)
+class PrefetcherTests(SimpleTestCase):
+    def setUp(self):
+        bbcode.autodiscover()
+        self.addCleanup(bbcode.register_resolver, 'quote', bbcode.lib.get_resolver('quote'))
+        bbcode.register_resolver('quote', self.resolve_quotes)
+        self.looked_up = []
+
+    def resolve_quotes(self, content_ids):
+        self.looked_up.append(sorted(content_ids))
+        return dict((content_id, QUOTE) for content_id in content_ids if content_id != 'missing')
+
+    def test_one_lookup_per_parse(self):
+        parsed, errors = bbcode.parse('[quote=1]a[/quote][quote=2]b[quote=3]c[/quote][/quote]', cache=False)
+        self.assertEqual(self.looked_up, [['1', '2', '3']])
+        self.assertEqual(parsed.count('Ada Lovelace'), 3)
+
+    def test_parse_many(self):
+        contents = ['[quote=%d]x[/quote]' % index for index in range(5)]
+        results = bbcode.parse_many(contents, cache=False, chunksize=3)
+        self.assertEqual(self.looked_up, [['0', '1', '2'], ['3', '4']])
+        self.assertEqual([parsed for parsed, errors in results],
+                         [bbcode.parse(content, cache=False)[0] for content in contents])
+
+    def test_prefetcher(self):
+        prefetcher = bbcode.Prefetcher()
+        prefetcher.add('quote', '1')
+        prefetcher.add('quote', 'missing')
+        self.assertEqual(prefetcher.get('quote', '1'), QUOTE)
+        self.assertEqual(prefetcher.get('quote', 'missing', 'default'), 'default')
+        self.assertEqual(prefetcher.get('quote', '1'), QUOTE)
+        # keys asked for later are resolved on their own
+        self.assertEqual(prefetcher.get('quote', '2'), QUOTE)
+        self.assertEqual(self.looked_up, [['1', 'missing'], ['2']])
+
+    def test_resolver_cache(self):
+        with override_settings(BBCODE_RESOLVER_CACHE={'MAXSIZE': 8}):
+            bbcode.parse('[quote=1]a[/quote]', cache=False)
+            bbcode.parse('[quote=1]a[/quote][quote=2]b[/quote]', cache=False)
+            bbcode.invalidate_resolved('quote', '1')
+            bbcode.parse('[quote=1]a[/quote][quote=2]b[/quote]', cache=False)
+        self.assertEqual(self.looked_up, [['1'], ['2'], ['1']])
+
+    def test_validate(self):
+        bbcode.validate('[quote=1]a[/quote]')
+        self.assertEqual(self.looked_up, [])
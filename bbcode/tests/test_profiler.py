@@ -0,0 +1,50 @@
+import threading
+from django.test import SimpleTestCase
+import bbcode
+from bbcode import profiler
+
+CONTENT = '[b]x[/b]\n[b][i]y[/i][/b]'
+
+
+class ProfilerTests(SimpleTestCase):
+    def setUp(self):
+        bbcode.autodiscover()
+
+    def test_phases(self):
+        with profiler.profile() as stats:
+            parsed, errors = bbcode.parse(CONTENT, cache=False)
+        self.assertEqual(parsed, bbcode.parse(CONTENT, cache=False)[0])
+        phases = stats.as_dict()['phases']
+        self.assertEqual(sorted(phases), sorted(profiler.PHASES))
+        self.assertEqual([phases[name]['calls'] for name in profiler.PHASES], [1, 1, 1, 1])
+        self.assertEqual(phases['linefeeds']['bytes'], len(parsed))
+
+    def test_tags(self):
+        with profiler.profile() as stats:
+            bbcode.parse(CONTENT, cache=False)
+        tags = stats.as_dict()['tags']
+        strong = tags[bbcode.get_class_path(bbcode.lib.names['strong']['class'])]
+        em = tags[bbcode.get_class_path(bbcode.lib.names['em']['class'])]
+        self.assertEqual((strong['calls'], em['calls']), (2, 1))
+        self.assertEqual(strong['bytes'], len('<strong>x</strong><strong><em>y</em></strong>'))
+        self.assertEqual(em['bytes'], len('<em>y</em>'))
+        self.assertTrue(0 <= strong['own'] <= strong['time'])
+        self.assertIn(bbcode.get_class_path(bbcode.lib.names['em']['class']), stats.report())
+
+    def test_outside_profile(self):
+        stats = profiler.Profile()
+        with profiler.profile(stats):
+            with profiler.profile() as inner:
+                bbcode.parse(CONTENT, cache=False)
+            self.assertIs(profiler.get_active_profile(), stats)
+        self.assertIsNone(profiler.get_active_profile())
+        bbcode.parse(CONTENT, cache=False)
+        self.assertEqual(stats.as_dict(), {'phases': {}, 'tags': {}})
+        self.assertEqual(inner.as_dict()['phases']['build']['calls'], 1)
+
+    def test_threads(self):
+        with profiler.profile() as stats:
+            thread = threading.Thread(target=bbcode.parse, args=(CONTENT,), kwargs={'cache': False})
+            thread.start()
+            thread.join()
+        self.assertEqual(stats.as_dict(), {'phases': {}, 'tags': {}})
@@ -0,0 +1,77 @@
+from django.test import SimpleTestCase, override_settings
+import bbcode
+from bbcode import mypygments
+from bbcode.bbtags import blocks
+from bbcode.cache import get_highlight_cache
+
+CODE = '[code=python]x = 1\nprint(x)[/code]'
+
+
+class LexerLookupTests(SimpleTestCase):
+    def setUp(self):
+        mypygments.LEXERS.clear()
+
+    def test_unknown_names_are_bounded(self):
+        for index in range(mypygments.LEXERS.maxsize * 2):
+            self.assertIsNone(mypygments.get_lexer_by_alias('nosuchlanguage%d' % index))
+        self.assertEqual(len(mypygments.LEXERS.data), mypygments.LEXERS.maxsize)
+
+    def test_alias(self):
+        self.assertEqual(mypygments.get_lexer_by_alias(' Python ').name, 'Python')
+
+    def test_guess(self):
+        self.assertEqual(mypygments.guess_sample('#!/usr/bin/env python\nprint 1\n', 0.05).name, 'Python')
+        self.assertTrue(mypygments.guess_sample('<?php echo 1; ?>', 0.05).name.startswith('PHP'))
+        # asks the lexers themselves without a heuristic matching
+        self.assertEqual(mypygments.guess_sample('diff --git a/x b/x\n--- a/x\n+++ b/x\n', 5).name, 'Diff')
+        self.assertEqual(mypygments.guess_sample('\\documentclass{article}\n', 5).name, 'TeX')
+
+    def test_guess_out_of_time(self):
+        diff = 'diff --git a/x b/x\n--- a/x\n+++ b/x\n'
+        mypygments.GUESSES.clear()
+        self.assertIsNone(mypygments.guess_sample(diff, -1))
+        with override_settings(BBCODE_LEXER_GUESS={'TIME': -1}):
+            self.assertEqual(mypygments.guess_lexer(diff).name, 'Text only')
+            # not memoized, the next guess asks the lexers again
+            self.assertEqual(len(mypygments.GUESSES.data), 0)
+        with override_settings(BBCODE_LEXER_GUESS={'TIME': 5}):
+            self.assertEqual(mypygments.guess_lexer(diff).name, 'Diff')
+            self.assertEqual(len(mypygments.GUESSES.data), 1)
+
+
+@override_settings(BBCODE_HIGHLIGHT_CACHE={'MAXSIZE': 8})
+class HighlightCacheTests(SimpleTestCase):
+    def setUp(self):
+        bbcode.autodiscover()
+        get_highlight_cache().clear()
+        highlight, mypygments = blocks.load_pygments()
+        self.highlighted = []
+        def counting_highlight(code, lexer, formatter):
+            self.highlighted.append(code)
+            return highlight(code, lexer, formatter)
+        self.addCleanup(setattr, blocks, 'PYGMENTS', blocks.PYGMENTS)
+        blocks.PYGMENTS = counting_highlight, mypygments
+
+    def test_hit(self):
+        first = bbcode.parse(CODE + CODE, cache=False)[0]
+        second = bbcode.parse(CODE, cache=False)[0]
+        self.assertEqual(self.highlighted, ['x = 1\nprint(x)'])
+        self.assertEqual(first, second * 2)
+        self.assertEqual(get_highlight_cache().local.stats()['size'], 1)
+
+    def test_same_as_uncached(self):
+        cached = bbcode.parse(CODE, cache=False)[0]
+        with override_settings(BBCODE_HIGHLIGHT_CACHE=None):
+            self.assertFalse(get_highlight_cache())
+            self.assertEqual(bbcode.parse(CODE, cache=False)[0], cached)
+
+    def test_key(self):
+        bbcode.parse(CODE, cache=False)
+        bbcode.parse(CODE.replace('python', 'ruby'), cache=False)
+        bbcode.parse(CODE.replace('1', '2'), cache=False)
+        self.assertEqual(len(self.highlighted), 3)
+        cache = get_highlight_cache()
+        formatter = mypygments.CodeHtmlFormatter()
+        lexer = mypygments.get_lexer_by_alias('python')
+        self.assertNotEqual(cache.get_key('x', lexer, formatter),
+                            cache.get_key('x', lexer.__class__(stripnl=False), formatter))
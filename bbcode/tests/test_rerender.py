@@ -0,0 +1,64 @@
+import json
+import os
+import shutil
+import tempfile
+import uuid
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+import bbcode
+from bbcode.management.commands.rerender_bbcode import Command
+from bbcode.tests.models import Post
+
+
+class RerenderTests(TestCase):
+    def setUp(self):
+        bbcode.autodiscover()
+        self.posts = [Post.objects.create(body='[b]%s[/b]' % index) for index in range(5)]
+        Post.objects.update(body_html='old', body_text='old', body_fingerprint='old')
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def rerender(self, *args, **options):
+        options.setdefault('verbosity', 0)
+        call_command('rerender_bbcode', *args, **options)
+        return list(Post.objects.order_by('pk').values_list('body_html', 'body_text', 'body_fingerprint'))
+
+    def rendered(self, index):
+        return ('<strong>%s</strong>' % index, str(index), bbcode.lib.get_fingerprint())
+
+    def test_rerender(self):
+        self.assertEqual(self.rerender('tests.Post', batch_size=2),
+                         [self.rendered(index) for index in range(5)])
+
+    def test_workers(self):
+        self.assertEqual(self.rerender(workers=2, batch_size=2, chunksize=1),
+                         [self.rendered(index) for index in range(5)])
+
+    def test_stale(self):
+        Post.objects.filter(pk=self.posts[0].pk).update(body_fingerprint=bbcode.lib.get_fingerprint())
+        rows = self.rerender(stale=True)
+        self.assertEqual(rows[0], ('old', 'old', bbcode.lib.get_fingerprint()))
+        self.assertEqual(rows[1:], [self.rendered(index) for index in range(1, 5)])
+
+    def test_checkpoint(self):
+        checkpoint = os.path.join(self.directory, 'checkpoint.json')
+        with open(checkpoint, 'w') as f:
+            json.dump({'tests.Post.body': self.posts[1].pk}, f)
+        rows = self.rerender(checkpoint=checkpoint, batch_size=2)
+        self.assertEqual(rows[:2], [('old', 'old', 'old')] * 2)
+        self.assertEqual(rows[2:], [self.rendered(index) for index in range(2, 5)])
+        with open(checkpoint) as f:
+            self.assertEqual(json.load(f), {'tests.Post.body': self.posts[4].pk})
+
+    def test_checkpoint_uuid(self):
+        key = uuid.uuid4()
+        command = Command()
+        command.checkpoint = os.path.join(self.directory, 'checkpoint.json')
+        command.progress = {'tests.Post.body': key}
+        command.save_checkpoint()
+        self.assertEqual(command.load_checkpoint(), {'tests.Post.body': str(key)})
+
+    def test_unknown_model(self):
+        with self.assertRaises(CommandError):
+            self.rerender('tests.Missing')
@@ -0,0 +1,40 @@
+from django.test import SimpleTestCase, override_settings
+import bbcode
+from bbcode import serializer
+from bbcode.tests.test_fields import CONTENTS
+
+
+def summarize(result):
+    parsed, errors = result
+    return parsed, [(error.lineno, error.column, error.message) for error in errors]
+
+
+class SerializerTests(SimpleTestCase):
+    def setUp(self):
+        bbcode.autodiscover()
+
+    def test_round_trip(self):
+        for content in CONTENTS + ['[code=python]x = 1[/code]', '[ul][*]a[*]b[/ul]', '[quote=1]a[/quote]']:
+            data = serializer.dumps(content)
+            for as_text in (False, True):
+                self.assertEqual(summarize(serializer.render(data, content, strict=False, as_text=as_text)),
+                                 summarize(bbcode.parse(content, strict=False, as_text=as_text, cache=False)),
+                                 repr(content))
+
+    def test_strict(self):
+        data = serializer.dumps('x[/center]')
+        with self.assertRaises(bbcode.ParserError):
+            serializer.render(data, 'x[/center]')
+
+    def test_stale(self):
+        data = serializer.dumps('[b]x[/b]')
+        with self.assertRaises(serializer.SerializationError):
+            serializer.render(data, '[b]y[/b]')
+
+    @override_settings(BBCODE_PARSE_BUDGET={'TAGS': 2})
+    def test_over_budget(self):
+        content = '[b]x[/b]<[i]y[/i]'
+        data = serializer.dumps(content)
+        self.assertEqual(summarize(serializer.render(data, content)),
+                         summarize(bbcode.parse(content, cache=False)))
+        self.assertEqual(serializer.render(data, content)[0], '[b]x[/b]&lt;[i]y[/i]')
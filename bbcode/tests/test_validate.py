@@ -0,0 +1,70 @@
+import random
+from django.test import SimpleTestCase
+import bbcode
+
+OPENING = ['[b]', '[i]', '[center]', '[p]', '[info]', '[h1]', '[quote=1]', '[url]',
+           '[url=http://a.b]', '[url href=http://x]', '[url css=a]', '[img]', '[email]',
+           '[download=f]', '[youtube]', '[ul]', '[steps]', '[step]', '[step=1]',
+           '[step=a]', '[code]']
+TEXT = ['x', ' ', '\n', 'http://e.com/a', ':)', '[*]', 'v=abc', 'a@b.c', 'http://[a']
+
+
+def generate(rng, depth=0):
+    content = ''
+    for index in range(rng.randint(1, 4)):
+        if depth < 4 and rng.random() < 0.5:
+            opening = rng.choice(OPENING)
+            name = opening[1:-1].split('=')[0].split(' ')[0]
+            content += opening + generate(rng, depth + 1) + '[/%s]' % name
+        else:
+            content += rng.choice(TEXT)
+    return content
+
+
+class ValidateTests(SimpleTestCase):
+    def setUp(self):
+        bbcode.autodiscover()
+
+    def messages(self, content, render=False):
+        return [error.message for error in bbcode.validate(content, render=render)]
+
+    def assertSameAsRender(self, content):
+        self.assertEqual([(error.lineno, error.column, error.message) for error in bbcode.validate(content)],
+                         [(error.lineno, error.column, error.message) for error in bbcode.validate(content, render=True)],
+                         repr(content))
+
+    def test_url_arguments(self):
+        content = '[url href=http://x]a[b]b[/b][/url]'
+        self.assertEqual(self.messages(content), [])
+        self.assertSameAsRender(content)
+        content = '[url]a[b]b[/b][/url]'
+        self.assertEqual(self.messages(content), ['Url tag cannot have nested tags without an argument.'])
+        self.assertSameAsRender(content)
+
+    def test_invalid_url(self):
+        content = '[url=http://example[/ul]x[/url]'
+        self.assertSameAsRender(content)
+        self.assertSameAsRender('[url]http://example[/ul[/url]')
+
+    def test_step(self):
+        self.assertEqual(self.messages('[step]x[/step]'), ['Step are only allowed within a steps list!'])
+        self.assertSameAsRender('[step]x[/step]')
+        self.assertSameAsRender('[steps][step=a]x[/step][/steps]')
+        self.assertSameAsRender('[steps][step=1][step]x[/step][/step][/steps]')
+
+    def test_youtube(self):
+        self.assertEqual(self.messages('[youtube][/youtube]'), ["'' does not seem like a youtube link"])
+        self.assertSameAsRender('[youtube][/youtube]')
+        self.assertSameAsRender('[youtube]x[b]y[/b][/youtube]')
+        self.assertSameAsRender('[youtube]http://www.youtube.com/watch?v=FjPf6B8EVJI[/youtube]')
+
+    def test_youtube_render(self):
+        parsed, errors = bbcode.parse('[youtube]http://www.youtube.com/watch?v=FjPf6B8EVJI[/youtube]', cache=False)
+        self.assertEqual(parsed.count('http://www.youtube.com/v/FjPf6B8EVJI&amp;'), 2)
+        self.assertTrue(parsed.endswith('</embed></object>'))
+        self.assertEqual(errors, [])
+
+    def test_random(self):
+        rng = random.Random(0)
+        for index in range(500):
+            self.assertSameAsRender(generate(rng))
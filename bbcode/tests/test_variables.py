@@ -0,0 +1,74 @@
+from django.test import SimpleTestCase
+import bbcode
+from bbcode import Lazy, VariableScope
+
+
+class VariableScopeTests(SimpleTestCase):
+    def setUp(self):
+        self.scope = VariableScope()
+        self.scope.add('site', 'example.com')
+        self.scope.add('s', '$site$')
+
+    def test_resolve(self):
+        self.assertEqual(self.scope.resolve('"http://$site$/$s$/$nope$"'), 'http://example.com/$site$/$nope$')
+        self.assertEqual(self.scope.resolve('$$site$$'), '$example.com$')
+        self.assertEqual(VariableScope().resolve('"$site$"'), '$site$')
+
+    def test_changes(self):
+        self.assertEqual(self.scope.resolve('$site$'), 'example.com')
+        self.scope.add('site', 'example.org')
+        self.scope.add(1, 2)
+        self.assertEqual(self.scope.resolve('$site$ $1$'), 'example.org 2')
+        del self.scope['site']
+        self.assertEqual(self.scope.resolve('$site$ $1$'), '$site$ 2')
+
+    def test_lazy_resolve(self):
+        self.assertEqual(self.scope.lazy_resolve('"plain"'), 'plain')
+        lazy = self.scope.lazy_resolve('$later$/$site$')
+        self.assertIsInstance(lazy, Lazy)
+        # variables added before the first use are seen
+        self.scope.add('later', 'x')
+        self.assertEqual(lazy, 'x/example.com')
+        self.scope.add('later', 'y')
+        self.assertEqual(str(lazy), 'x/example.com')
+
+
+class LazyTests(SimpleTestCase):
+    def test_memoized(self):
+        calls = []
+        def resolver(context):
+            calls.append(context)
+            return context.upper()
+        lazy = Lazy(resolver, 'abc')
+        self.assertEqual(len(lazy), 3)
+        self.assertEqual(lazy + 'd', 'ABCd')
+        self.assertEqual('x' + lazy, 'xABC')
+        self.assertIn('B', lazy)
+        self.assertEqual(lazy[0], 'A')
+        self.assertEqual(lazy.lower(), 'abc')
+        self.assertEqual(list(lazy), ['A', 'B', 'C'])
+        self.assertTrue(lazy)
+        self.assertEqual(calls, ['abc'])
+
+    def test_numbers(self):
+        lazy = Lazy(lambda context: context, '42')
+        self.assertEqual(int(lazy), 42)
+        self.assertEqual(hash(lazy), hash('42'))
+        self.assertEqual('%s!' % lazy, '42!')
+        self.assertEqual(lazy % (), '42')
+        self.assertFalse(lazy != '42')
+
+
+class RenderVariablesTests(SimpleTestCase):
+    def setUp(self):
+        bbcode.autodiscover()
+
+    def test_arguments(self):
+        content = '[url=http://$site$/a]link[/url] [download=$file$]f[/download]'
+        parse_context = bbcode.ParseContext(content)
+        head = bbcode.lib.get_parse_tree(content, parse_context=parse_context)
+        parse_context.variables.add('site', 'example.com')
+        parse_context.variables.add('file', 'a.zip')
+        parsed = head.parse()
+        self.assertIn('href="http://example.com/a"', parsed)
+        self.assertNotIn('$', parsed)
@@ -0,0 +1,106 @@
+"""
+Synthetic BBCode corpora for the benchmarks. Every corpus is generated from a
+seed, so two runs (and a run and its baseline) time the same documents.
+"""
+import random
+
+WORDS = ('the', 'django', 'model', 'query', 'template', 'cache', 'view', 'form',
+         'field', 'server', 'request', 'response', 'python', 'list', 'loop',
+         'value', 'error', 'test', 'user', 'post', 'page', 'install', 'run',
+         'with', 'and', 'for', 'this', 'that', 'works', 'fast', 'slow')
+
+EMOTICONS = (':)', ':-)', ';)', ':D', ':P', ':(', ':S', ':/', ':|', 'B)', ':@', "--'")
+
+INLINE = ('b', 'i', 'u')
+
+CODE = {
+    'python': "def %(name)s(items):\n    for item in items:\n        if item.%(word)s:\n            yield item\n",
+    'javascript': "function %(name)s(items) {\n    return items.filter(function (item) {\n        return item.%(word)s;\n    });\n}\n",
+    'sql': "SELECT id, %(word)s FROM %(name)s WHERE %(word)s IS NOT NULL;\n",
+}
+
+
+def sentence(rng, words=12):
+    return ' '.join(rng.choice(WORDS) for i in range(rng.randint(words // 2, words))) + '.'
+
+def styled_sentence(rng):
+    words = sentence(rng).split(' ')
+    index = rng.randrange(len(words))
+    tag = rng.choice(INLINE)
+    words[index] = '[%s]%s[/%s]' % (tag, words[index], tag)
+    if rng.random() < 0.3:
+        words.insert(index, 'http://example.com/%s' % rng.choice(WORDS))
+    return ' '.join(words)
+
+def short_comment(rng):
+    lines = [styled_sentence(rng) for i in range(rng.randint(1, 3))]
+    if rng.random() < 0.5:
+        lines.append(rng.choice(EMOTICONS))
+    return '\n'.join(lines)
+
+def tutorial(rng):
+    parts = ['[h1]%s[/h1]' % sentence(rng, 6)]
+    for section in range(rng.randint(4, 8)):
+        parts.append('[h2]%s[/h2]' % sentence(rng, 4))
+        parts.extend(styled_sentence(rng) for i in range(rng.randint(2, 5)))
+        language = rng.choice(sorted(CODE))
+        code = ''.join(CODE[language] % {'name': rng.choice(WORDS), 'word': rng.choice(WORDS)}
+                       for i in range(rng.randint(2, 10)))
+        parts.append('[code=%s]%s[/code]' % (language, code))
+        if rng.random() < 0.5:
+            parts.append('[ul]%s[/ul]' % ''.join('[*] %s\n' % sentence(rng, 6) for i in range(4)))
+        if rng.random() < 0.3:
+            parts.append('[info]%s[/info]' % styled_sentence(rng))
+    return '\n\n'.join(parts)
+
+def chat(rng):
+    return '\n'.join('%s %s %s' % (rng.choice(EMOTICONS), sentence(rng, 6), rng.choice(EMOTICONS))
+                     for i in range(rng.randint(20, 60)))
+
+def nested_lists(rng):
+    depth = rng.randint(10, 30)
+    content = sentence(rng)
+    for level in range(depth):
+        tag = rng.choice(('ul', 'ol'))
+        content = '[%s][*] %s\n[*] %s[/%s]' % (tag, sentence(rng, 4), content, tag)
+    return content
+
+def unclosed_tags(rng):
+    parts = ['[b]']
+    for i in range(rng.randint(5, 20)):
+        tag = rng.choice(INLINE)
+        parts.append('[%s]%s' % (tag, sentence(rng, 6)))
+        if rng.random() < 0.5:
+            parts.append('[/%s]' % tag)
+        elif rng.random() < 0.3:
+            # closes the outer [b], pulling the tags left open
+            parts.append('[/b] [b]')
+    return ' '.join(parts)
+
+def adversarial_urls(rng):
+    # inputs that made the AutoDetectURL pattern backtrack
+    size = rng.randint(2000, 5000)
+    return rng.choice((
+        'http://' + 'a' * size + '!',
+        'http://' + '.-' * (size // 2) + ' ',
+        'http://a' * (size // 8),
+        'http://a/?' + 'x' * size,
+        '[url]' + 'http://a' * (size // 8) + '[/url]',
+    ))
+
+CORPORA = {
+    'comments': (short_comment, 500),
+    'tutorials': (tutorial, 20),
+    'chat': (chat, 50),
+    'nested': (nested_lists, 50),
+    'unclosed': (unclosed_tags, 200),
+    'urls': (adversarial_urls, 20),
+}
+
+def generate(name, count=None, seed=0):
+    """
+    Get the documents of a corpus, 'count' overrides its default size.
+    """
+    function, default = CORPORA[name]
+    rng = random.Random('%s:%s' % (name, seed))
+    return [function(rng) for i in range(count or default)]
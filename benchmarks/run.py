@@ -0,0 +1,183 @@
+"""
+Times bbcode.parse, parse(as_text=True), bbcode.validate and the {% bbcode %}
+template tag on the synthetic corpora of corpus.py and reports throughput and
+latency percentiles:
+
+    python benchmarks/run.py
+    python benchmarks/run.py --save baseline.json
+    python benchmarks/run.py --compare baseline.json
+
+Comparing flags every result whose median or 90th percentile got slower than
+the baseline by more than --threshold and exits with status 1. Set
+DJANGO_SETTINGS_MODULE to run with the settings of a project, otherwise the
+render and highlight caches are disabled so the parser itself is timed.
+"""
+import os
+import sys
+import json
+import platform
+from optparse import OptionParser
+from timeit import default_timer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import corpus
+
+OPERATIONS = ('parse', 'text', 'validate', 'template')
+FORMAT_VERSION = 1
+
+
+def setup():
+    from django.conf import settings
+    if not os.environ.get('DJANGO_SETTINGS_MODULE'):
+        settings.configure(
+            INSTALLED_APPS=['bbcode'],
+            MEDIA_URL='/media/',
+            TEMPLATES=[{'BACKEND': 'django.template.backends.django.DjangoTemplates',
+                        'APP_DIRS': True}],
+            BBCODE_HIGHLIGHT_CACHE=None,
+        )
+    import django
+    django.setup()
+    import bbcode
+    bbcode.autodiscover()
+
+def get_operations():
+    """
+    Get the timed functions by name, each takes a document.
+    """
+    import bbcode
+    from django.template import Template, Context
+    template = Template('{% load bbcode %}{% bbcode content %}')
+    return {
+        'parse': lambda content: bbcode.parse(content, strict=False, cache=False),
+        'text': lambda content: bbcode.parse(content, strict=False, as_text=True, cache=False),
+        'validate': lambda content: bbcode.validate(content),
+        'template': lambda content: template.render(Context({'content': content})),
+    }
+
+def percentile(timings, percent):
+    """
+    Nearest rank percentile of sorted timings.
+    """
+    index = int(round(percent / 100.0 * len(timings) + 0.5)) - 1
+    return timings[max(0, min(index, len(timings) - 1))]
+
+def measure(function, documents, repeat):
+    """
+    Time each document 'repeat' times after a warm up pass, returns the
+    statistics in milliseconds.
+    """
+    for document in documents:
+        function(document)
+    timings = []
+    for i in range(repeat):
+        for document in documents:
+            started = default_timer()
+            function(document)
+            timings.append((default_timer() - started) * 1000)
+    total = sum(timings)
+    size = sum(len(document) for document in documents) * repeat
+    timings.sort()
+    return {
+        'docs': len(documents),
+        'docs_per_sec': len(timings) / total * 1000 if total else 0,
+        'kb_per_sec': size / 1024.0 / total * 1000 if total else 0,
+        'p50': percentile(timings, 50),
+        'p90': percentile(timings, 90),
+        'p99': percentile(timings, 99),
+        'max': timings[-1],
+    }
+
+def run(options, operations):
+    results = {}
+    for name in options.corpus or sorted(corpus.CORPORA):
+        documents = corpus.generate(name, options.count, options.seed)
+        for operation in options.operation or OPERATIONS:
+            results['%s.%s' % (name, operation)] = measure(operations[operation], documents, options.repeat)
+    return results
+
+def compare(results, baseline, threshold):
+    """
+    Returns the (name, statistic, baseline, current) tuples of the results
+    slower than the baseline by more than 'threshold' (a ratio).
+    """
+    regressions = []
+    for name, stats in sorted(results.items()):
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        for key in ('p50', 'p90'):
+            if previous[key] and stats[key] > previous[key] * (1 + threshold):
+                regressions.append((name, key, previous[key], stats[key]))
+    return regressions
+
+def report(results, baseline=None, out=sys.stdout):
+    out.write('%-20s %6s %10s %10s %9s %9s %9s %9s %9s\n' % (
+        'benchmark', 'docs', 'docs/s', 'KB/s', 'p50 ms', 'p90 ms', 'p99 ms', 'max ms', 'vs base'))
+    for name, stats in sorted(results.items()):
+        change = ''
+        if baseline and baseline.get(name, {}).get('p50'):
+            change = '%+.0f%%' % ((stats['p50'] / baseline[name]['p50'] - 1) * 100)
+        out.write('%-20s %6d %10.1f %10.1f %9.3f %9.3f %9.3f %9.3f %9s\n' % (
+            name, stats['docs'], stats['docs_per_sec'], stats['kb_per_sec'],
+            stats['p50'], stats['p90'], stats['p99'], stats['max'], change))
+
+def main(argv=None):
+    parser = OptionParser(usage='%prog [options]', description=__doc__.strip().split('\n\n')[0])
+    parser.add_option('-c', '--corpus', action='append', choices=sorted(corpus.CORPORA),
+                      help='Only run this corpus (repeatable): %s.' % ', '.join(sorted(corpus.CORPORA)))
+    parser.add_option('-o', '--operation', action='append', choices=OPERATIONS,
+                      help='Only time this operation (repeatable): %s.' % ', '.join(OPERATIONS))
+    parser.add_option('-n', '--count', type='int',
+                      help='Documents per corpus (default: depends on the corpus).')
+    parser.add_option('-r', '--repeat', type='int', default=3,
+                      help='Timed passes over each corpus (default: 3).')
+    parser.add_option('--seed', type='int', default=0,
+                      help='Seed of the corpus generator (default: 0).')
+    parser.add_option('--profile', action='store_true',
+                      help='Also print the time spent in each phase and tag class '
+                           '(slows the run down, do not save such results).')
+    parser.add_option('--save', metavar='FILE',
+                      help='Store the results as a JSON baseline.')
+    parser.add_option('--compare', metavar='FILE',
+                      help='Compare the results against a JSON baseline.')
+    parser.add_option('--threshold', type='float', default=0.2,
+                      help='Slowdown flagged as a regression (default: 0.2, ie 20%).')
+    options, args = parser.parse_args(argv)
+    setup()
+    operations = get_operations()
+    baseline = None
+    if options.compare:
+        with open(options.compare) as f:
+            data = json.load(f)
+        if data.get('version') != FORMAT_VERSION:
+            parser.error('%s is not a baseline of this version.' % options.compare)
+        baseline = data['results']
+    stats = None
+    if options.profile:
+        from bbcode.profiler import profile
+        with profile() as stats:
+            results = run(options, operations)
+    else:
+        results = run(options, operations)
+    report(results, baseline)
+    if stats is not None:
+        sys.stdout.write('\n%s\n' % stats.report())
+    if options.save:
+        with open(options.save, 'w') as f:
+            json.dump({'version': FORMAT_VERSION,
+                       'python': platform.python_version(),
+                       'seed': options.seed,
+                       'results': results}, f, indent=2, sort_keys=True)
+    if baseline is not None:
+        regressions = compare(results, baseline, options.threshold)
+        for name, key, previous, current in regressions:
+            sys.stdout.write('REGRESSION %s %s: %.3f ms -> %.3f ms\n' % (name, key, previous, current))
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
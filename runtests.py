@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+"""
+Runs the tests of bbcode with a minimal configuration:
+
+    python runtests.py
+    python runtests.py bbcode.tests.test_fields
+"""
+import os
+import sys
+
+from django.conf import settings
+
+
+def main(argv):
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    settings.configure(
+        DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}},
+        INSTALLED_APPS=['django.contrib.contenttypes', 'bbcode', 'bbcode.tests'],
+        MEDIA_URL='/media/',
+        TEMPLATES=[{'BACKEND': 'django.template.backends.django.DjangoTemplates',
+                    'APP_DIRS': True}],
+        BBCODE_HIGHLIGHT_CACHE=None,
+    )
+    import django
+    django.setup()
+    from django.test.runner import DiscoverRunner
+    failures = DiscoverRunner(verbosity=1).run_tests(argv[1:] or ['bbcode.tests'])
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -1,4 +1,4 @@
-from distutils.core import setup
+from setuptools import setup
 
 setup(
     name='waaave-bbcode',
@@ -10,8 +10,14 @@ setup(
     packages=[
         'bbcode',
         'bbcode.bbtags',
+        'bbcode.management',
+        'bbcode.management.commands',
         'bbcode.templatetags',
     ],
+    install_requires=[
+        # concurrent.futures, for parse_many and rerender_bbcode --workers
+        'futures; python_version < "3"',
+    ],
     classifiers=[
         'Development Status :: 4 - Beta',
         'Environment :: Web Environment',
@@ -19,6 +25,8 @@ setup(
         'License :: OSI Approved',
         'Operating System :: OS Independent',
         'Programming Language :: Python',
+        'Programming Language :: Python :: 2',
+        'Programming Language :: Python :: 3',
         'Framework :: Django',
     ]
 )